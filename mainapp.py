@@ -1,9 +1,8 @@
 import streamlit as st
 from google import genai
-from google.genai import types
-from google.genai import caches
 from simple_rag import SimpleRAGSystem
-import json
+from gaziantep_rag import GaziantepRAGSystem
+from rag.federated import FederatedRetriever
 from datetime import datetime
 import os
 import langdetect
@@ -11,6 +10,10 @@ from langdetect import detect, DetectorFactory
 
 from managers.instruction_manager import InstructionManager, get_comprehensive_system_instruction
 from managers.api_manager import get_api_manager  
+from managers.resource_registry import get_resource_registry
+from managers.conversation_store import ConversationStore, resolve_session_id
+from managers.context_builder import ContextBuilder
+from managers.context_cache_manager import ContextCacheManager, is_stale_cache_error
 
 # Streamlit config
 st.set_page_config(
@@ -22,6 +25,7 @@ st.set_page_config(
 GOOGLE_CLOUD_PROJECT_ID =os.getenv("GOOGLE_CLOUD_PROJECT_ID")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "http://localhost:8000")
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash-lite-001")
+CONVERSATION_DIR = os.getenv("CONVERSATION_DIR", "./conversations")  # Oturum başına .jsonl geçmiş
 
 # Dil algılama için seed ayarla
 DetectorFactory.seed = 0
@@ -40,6 +44,14 @@ SUPPORTED_LANGUAGES = {
     'zh': '中文'
 }
 
+# RAG araması tetikleyen anahtar kelimeler ve context'teki corpus başlıkları
+RAG_KEYWORDS = ['unesco', 'heritage', 'miras', 'tarih', 'history', 'culture', 'kültür',
+                'gaziantep', 'antep', 'zeugma']
+RAG_CORPUS_LABELS = {
+    'unesco': 'UNESCO Dünya Mirası',
+    'gaziantep': 'Gaziantep Turizm Rehberi'
+}
+
 # Load CSS
 try:
     with open('custom.css') as f:
@@ -64,24 +76,42 @@ def detect_language(text):
 
 # --- Main RAG Class ---
 class GeminiRAGWithMemory:
-    def __init__(self, project_id="fast-haiku-463913-s9"):
+    def __init__(self, project_id="fast-haiku-463913-s9", session_id=None):
+        # Model, index, corpus ve client process genelinde paylaşılır - oturumda sadece konuşma durumu
+        self.resources = get_resource_registry()
+        
         # Google Cloud Project API
-        self.client = genai.Client(
-            vertexai=True,
-            project=project_id,
-            location="global"
+        self.client = self.resources.get_or_create(
+            ("genai_client", project_id),
+            lambda: genai.Client(
+                vertexai=True,
+                project=project_id,
+                location="global"
+            )
         )
         self.model = MODEL_NAME
         self.conversation_history = []
-        self.memory_file = "conversation_memory.json"
+        self.session_id = resolve_session_id(session_id)
+        self.conversation_store = self.resources.get_or_create(
+            ("conversation_store", CONVERSATION_DIR), lambda: ConversationStore(CONVERSATION_DIR))
         self.webhook_url = WEBHOOK_URL
         self.rag_system = None
+        self.gaziantep_rag = None
+        self.retriever = None  # UNESCO + Gaziantep birleşik arama
         self.current_language = 'tr'  # Varsayılan dil
         
         #Yeni manager sınıf ları
-        self.instruction_manager = InstructionManager()
+        self.instruction_manager = self.resources.get_or_create("instruction_manager", InstructionManager)
         self.api_manager = get_api_manager(self.webhook_url)
         
+        # Geçmiş CONTEXT_TOKEN_BUDGET token'a sığdırılır - son tur istatistikleri last_context_stats'ta
+        self.context_builder = ContextBuilder()
+        self.last_context_stats = None
+        
+        # Dil başına talimat + tool şeması Gemini'de cache'lenir - tüm oturumlar aynı cache'i kullanır
+        self.context_cache = self.resources.get_or_create(
+            ("context_cache", project_id, self.model), lambda: ContextCacheManager(self.client, self.model))
+        
         self.setup_rag()
         self.load_memory()
         
@@ -89,28 +119,38 @@ class GeminiRAGWithMemory:
         """RAG sistemini kur"""
         try:
             print("🤖 RAG sistemi kuruluyor...")
-            self.rag_system = SimpleRAGSystem()
+            # İlk oturum kurulumu arka planda başlatır, sonraki oturumlar registry'deki motoru alır.
+            # UI beklemez - motor hazır olana kadar arama BM25'e düşer ya da atlanır
+            self.rag_system = self.resources.get_rag_engine("unesco", SimpleRAGSystem, background=True)
             
-            if self.rag_system.setup():
-                stats = self.rag_system.get_stats()
-                print(f"✅ RAG hazır: {stats['sites_count']} UNESCO sitesi")
-            else:
-                print("❌ RAG kurulumu başarısız")
-                self.rag_system = None
+            # Gaziantep corpus'u aynı modeli kullanır - ikinci kez yüklenmez
+            self.gaziantep_rag = self.resources.get_rag_engine("gaziantep", GaziantepRAGSystem, background=True)
+            
+            engines = {'unesco': self.rag_system, 'gaziantep': self.gaziantep_rag}
+            available = tuple(sorted(name for name, engine in engines.items() if engine))
+            if available:
+                self.retriever = self.resources.get_or_create(
+                    ("federated",) + available,
+                    lambda: FederatedRetriever(engines, labels=RAG_CORPUS_LABELS)
+                )
                 
         except Exception as e:
             print(f"❌ RAG hatası: {str(e)}")
             self.rag_system = None
     
     def get_rag_context(self, user_query):
-        """RAG sisteminden context al"""
-        if not self.rag_system:
+        """RAG sisteminden context al - UNESCO ve Gaziantep tek sorgu embedding'iyle aranır"""
+        if not self.retriever:
+            return None
+        
+        if not any(engine.is_searchable() for engine in self.retriever.engines.values()):
+            print("⏳ RAG henüz hazır değil, context olmadan devam ediliyor")
             return None
             
         try:
-            results = self.rag_system.search(user_query, top_k=15, threshold=0.1)
+            results = self.retriever.search(user_query, top_k=15, threshold=0.1)
             if results:
-                context = self.rag_system.format_for_gemini(results)
+                context = self.retriever.format_for_gemini(results)
                 print(f" RAG: {len(results)} sonuç bulundu")
                 return context
             else:
@@ -133,38 +173,15 @@ class GeminiRAGWithMemory:
         
         return detected_lang
         
-    def save_memory(self):
-        try:
-            memory_data = {
-                'conversation_history': self.conversation_history,
-                'current_language': self.current_language
-            }
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(memory_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Memory kaydetme hatası: {e}")
-
     def load_memory(self):
+        """Bu oturumun geçmişini yükle - dil son mesajdan devam eder"""
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    memory_data = json.load(f)
-                    
-                # Eski format kontrolü
-                if isinstance(memory_data, list):
-                    self.conversation_history = memory_data
-                    self.current_language = 'tr'
-                else:
-                    self.conversation_history = memory_data.get('conversation_history', [])
-                    self.current_language = memory_data.get('current_language', 'tr')
-                    
-                print(f"📚 Memory yüklendi: {len(self.conversation_history)} mesaj")
-            else:
-                self.conversation_history = []
-                self.current_language = 'tr'
-                print("Memory dosyası bulunamadı, yeni başlatılıyor")
+            self.conversation_history = self.conversation_store.load(self.session_id)
+            self.current_language = (self.conversation_history[-1].get('language', 'tr')
+                                     if self.conversation_history else 'tr')
+            print(f"📚 Memory yüklendi: {len(self.conversation_history)} mesaj (session {self.session_id})")
                 
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+        except OSError as e:
             self.conversation_history = []
             self.current_language = 'tr'
             print(f"Memory yükleme hatası: {e}")
@@ -184,44 +201,39 @@ class GeminiRAGWithMemory:
         
         return cities[-1] if cities else None
     
-    def add_to_memory(self, role, content):
-        self.conversation_history.append({
+    def add_to_memory(self, role, content, tool_results=None, error=False):
+        turn = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat(),
             "language": self.current_language
-        })
+        }
+        # API çıktıları ve hatalar ayrı işaretlenir - context builder eski turlarda bunları kısaltır
+        if tool_results:
+            turn["tool_results"] = tool_results
+        if error:
+            turn["error"] = True
+        self.conversation_history.append(turn)
         
         if len(self.conversation_history) > 25:
             self.conversation_history = self.conversation_history[-25:]
         
-        self.save_memory()
+        # Sadece yeni mesaj dosyaya eklenir
+        try:
+            self.conversation_store.append(self.session_id, turn)
+        except OSError as e:
+            print(f"Memory kaydetme hatası: {e}")
         print(f"Memory'ye eklendi: {role} - {content[:50]}... [Lang: {self.current_language}]")
     
     def build_contents_with_memory(self, user_query, rag_context=None):
-        contents = []
-        
         processed_query = user_query
         
         # RAG context ekle
         if rag_context:
-            processed_query = f"{processed_query}\n\n[UNESCO VERİLERİ]\n{rag_context}\n[/UNESCO VERİLERİ]"
+            processed_query = f"{processed_query}\n\n[TURİZM VERİLERİ]\n{rag_context}\n[/TURİZM VERİLERİ]"
         
-        for msg in self.conversation_history:
-            role = "user" if msg["role"] == "user" else "model"
-            contents.append(
-                types.Content(
-                    role=role,
-                    parts=[types.Part(text=msg["content"])]
-                )
-            )
-        
-        contents.append(
-            types.Content(
-                role="user",
-                parts=[types.Part(text=processed_query)]
-            )
-        )
+        contents, self.last_context_stats = self.context_builder.build(self.conversation_history, processed_query)
+        print(ContextBuilder.format_stats(self.last_context_stats))
         
         return contents
     
@@ -231,8 +243,8 @@ class GeminiRAGWithMemory:
         
         # RAG context kontrolü - basit anahtar kelimeler
         rag_context = None
-        if any(keyword in user_query.lower() for keyword in ['unesco', 'heritage', 'miras', 'tarih', 'history', 'culture', 'kültür']):
-            if self.rag_system:
+        if any(keyword in user_query.lower() for keyword in RAG_KEYWORDS):
+            if self.retriever:
                 rag_context = self.get_rag_context(user_query)
         
         # Build contents for Gemini
@@ -244,15 +256,18 @@ class GeminiRAGWithMemory:
         # ✅ YENİ: API Manager'dan tools al (50+ satır kod silindi!)
         tools = self.api_manager.get_tools()
 
-        generate_content_config = types.GenerateContentConfig(
+        # Cache varsa talimat ve tools tekrar gönderilmez, sadece cache adı
+        generate_content_config = self.context_cache.build_config(
+            detected_lang, system_instruction, tools,
             temperature=0.3,
-            top_p=0.95,
-            tools=tools,
-            system_instruction=system_instruction
+            top_p=0.95
         )
         
         try:
             full_response_content = ""
+            tool_results = []
+            # Turdaki function call'lar paralel çalışır, sonuçlar sırayla alınır
+            function_calls = self.api_manager.new_batch(self.current_language)
             
             response_stream = self.client.models.generate_content_stream(
                 model=self.model,
@@ -261,6 +276,10 @@ class GeminiRAGWithMemory:
             )
 
             for chunk in response_stream:
+                # Gemini'nin saydığı gerçek prompt token sayısı (tahminin yanında raporlanır)
+                if chunk.usage_metadata and chunk.usage_metadata.prompt_token_count:
+                    self.last_context_stats["prompt_tokens"] = chunk.usage_metadata.prompt_token_count
+                
                 if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
                     for part in chunk.candidates[0].content.parts:
                         if part.function_call:
@@ -269,26 +288,35 @@ class GeminiRAGWithMemory:
                             function_args = {k: v for k, v in function_call.args.items()}
 
                             # ✅ YENİ: Tek satır - tüm API'ler (100+ satır if-else silindi!)
-                            api_data = self.api_manager.handle_function_call(
-                                function_name, function_args, self.current_language
-                            )
-                            
-                            full_response_content += api_data + "\n\n"
-                            yield api_data + "\n\n"
+                            # Beklemeden başlat - aynı turdaki diğer çağrılarla birlikte çalışır
+                            function_calls.submit(function_name, function_args)
 
                         else:
+                            # Metin gelince önce bekleyen API sonuçlarını sırayla ver
+                            for api_data in function_calls.results():
+                                tool_results.append(api_data)
+                                yield api_data + "\n\n"
+                            
                             chunk_text = part.text
                             full_response_content += chunk_text
                             yield chunk_text
             
+            # Sadece function call geldiyse (metin yok)
+            for api_data in function_calls.results():
+                tool_results.append(api_data)
+                yield api_data + "\n\n"
+            
             self.add_to_memory("user", user_query)
-            self.add_to_memory("model", full_response_content)
+            self.add_to_memory("model", full_response_content, tool_results=tool_results)
             
         except Exception as e:
+            # Sunucuda süresi dolmuş / silinmiş cache - sonraki istekte yeniden oluşturulur
+            if generate_content_config.cached_content and is_stale_cache_error(e):
+                self.context_cache.invalidate(detected_lang)
             error_msg = f"❌ Error occurred / Bir hata oluştu: {str(e)}"
             yield error_msg
             self.add_to_memory("user", user_query)
-            self.add_to_memory("model", error_msg)
+            self.add_to_memory("model", error_msg, error=True)
 
 # --- Streamlit App ---
 def render_message(role, content):
@@ -312,11 +340,15 @@ def main():
     st.title("🤖 Tourism Chatbot")
     st.markdown("*Automatically detects and responds in your language*")
     
+    # Oturum kimliği URL'de tutulur - sayfa yenilense de bu oturumun geçmişi korunur
+    session_id = resolve_session_id(st.query_params.get("sid"))
+    st.query_params["sid"] = session_id
+    
     # Initialize RAG bot
     if 'rag_bot' not in st.session_state:
         with st.spinner("🔧 Setting up system..."):
             try:
-                st.session_state.rag_bot = GeminiRAGWithMemory()
+                st.session_state.rag_bot = GeminiRAGWithMemory(session_id=session_id)
                 
                 # 
                 stats = st.session_state.rag_bot.instruction_manager.get_instruction_stats()
@@ -333,13 +365,24 @@ def main():
                 with st.expander("🔧 System Details"):
                     st.json({
                         "instructions": stats,
-                        "api_manager": api_stats
+                        "api_manager": api_stats,
+                        "rag": st.session_state.rag_bot.resources.get_rag_readiness(),
+                        "context_cache": st.session_state.rag_bot.context_cache.get_stats()
                     })
                     
             except Exception as e:
                 st.error(f"❌ System setup error: {str(e)}")
                 st.stop()
     
+    # RAG arka planda kuruluyorsa durumunu göster
+    rag_readiness = st.session_state.rag_bot.resources.get_rag_readiness()
+    pending = {name: state for name, state in rag_readiness.items() if not state["ready"]}
+    if pending:
+        st.caption("⏳ Knowledge base warming up: " + ", ".join(
+            f"{name} {state['progress']:.0%} ({state['error'] or state['stage']})"
+            for name, state in pending.items()
+        ))
+    
     # Initialize messages
     if 'messages' not in st.session_state:
         st.session_state.messages = [
@@ -370,6 +413,12 @@ def main():
                 
                 message_placeholder.markdown(full_response)
                 
+                context_stats = st.session_state.rag_bot.last_context_stats
+                if context_stats:
+                    st.caption(ContextBuilder.format_stats(context_stats) +
+                               (f" · Gemini: {context_stats['prompt_tokens']} prompt tokens"
+                                if 'prompt_tokens' in context_stats else ""))
+                
             except Exception as e:
                 error_msg = f"❌ An error occurred: {str(e)}"
                 message_placeholder.markdown(error_msg)
@@ -1,7 +1,5 @@
 import streamlit as st
 from google import genai
-from google.genai import types
-import json
 from datetime import datetime
 import os
 from langdetect import detect, DetectorFactory
@@ -11,7 +9,14 @@ import base64
 
 from managers.instruction_manager import InstructionManager, get_comprehensive_system_instruction
 from managers.api_manager import get_api_manager
+from managers.resource_registry import get_resource_registry
+from managers.conversation_store import ConversationStore, resolve_session_id
+from managers.context_builder import ContextBuilder
+from managers.context_cache_manager import ContextCacheManager, is_stale_cache_error
+from managers.conversation_summarizer import ConversationSummarizer
 from gaziantep_rag import GaziantepRAGSystem
+from simple_rag import SimpleRAGSystem
+from rag.federated import FederatedRetriever
 
 load_dotenv()
 
@@ -21,6 +26,7 @@ st.set_page_config(page_title="Gaziantep Tourism Chatbot", page_icon="🏛️",
 GOOGLE_CLOUD_PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT_ID")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "http://localhost:8000")
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash-lite-001")
+CONVERSATION_DIR = os.getenv("CONVERSATION_DIR", "./gaziantep_conversations")  # Oturum başına .jsonl geçmiş
 AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
 AZURE_SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION")
 
@@ -88,6 +94,19 @@ class AzureVoiceManager:
         except:
             return None
 
+def create_genai_client(project_id):
+    """SDK sürümüne göre çalışan ilk client'ı oluştur - hiçbiri olmazsa None"""
+    try:
+        return genai.Client(vertexai=True, project=project_id)
+    except Exception as e1:
+        try:
+            return genai.Client(project=project_id)
+        except Exception as e2:
+            try:
+                return genai.Client()
+            except Exception as e3:
+                return None
+
 def detect_language(text):
     try:
         if len(text.strip()) < 5:
@@ -98,45 +117,66 @@ def detect_language(text):
         return 'tr'
 
 class GaziantepRAGWithMemory:
-    def __init__(self, project_id=None):
+    def __init__(self, project_id=None, session_id=None):
         self.project_id = project_id or GOOGLE_CLOUD_PROJECT_ID
         
-        try:
-            self.client = genai.Client(vertexai=True, project=self.project_id)
-        except Exception as e1:
-            try:
-                self.client = genai.Client(project=self.project_id)
-            except Exception as e2:
-                try:
-                    self.client = genai.Client()
-                except Exception as e3:
-                    st.error("❌ Google Genai Client initialization failed. Check your SDK version.")
-                    st.stop()
+        # Model, index, corpus, client ve ses konfigürasyonu process genelinde paylaşılır
+        self.resources = get_resource_registry()
+        
+        self.client = self.resources.get_or_create(
+            ("genai_client", self.project_id), lambda: create_genai_client(self.project_id))
+        if self.client is None:
+            st.error("❌ Google Genai Client initialization failed. Check your SDK version.")
+            st.stop()
         
         self.model = MODEL_NAME
         self.conversation_history = []
-        self.memory_file = "gaziantep_conversation_memory.json"
+        self.session_id = resolve_session_id(session_id)
+        self.conversation_store = self.resources.get_or_create(
+            ("conversation_store", CONVERSATION_DIR), lambda: ConversationStore(CONVERSATION_DIR))
         self.webhook_url = WEBHOOK_URL
         self.current_language = 'tr'
         
-        self.voice_manager = AzureVoiceManager()
-        self.instruction_manager = InstructionManager()
+        self.voice_manager = self.resources.get_or_create("voice_manager", AzureVoiceManager)
+        self.instruction_manager = self.resources.get_or_create("instruction_manager", InstructionManager)
         self.api_manager = get_api_manager(self.webhook_url)
         
+        # Geçmiş CONTEXT_TOKEN_BUDGET token'a sığdırılır - son tur istatistikleri last_context_stats'ta
+        self.context_builder = ContextBuilder()
+        self.last_context_stats = None
+        
+        # Dil başına talimat + tool şeması Gemini'de cache'lenir - tüm oturumlar aynı cache'i kullanır
+        self.context_cache = self.resources.get_or_create(
+            ("context_cache", self.project_id, self.model), lambda: ContextCacheManager(self.client, self.model))
+        
+        # Pencereden çıkan eski mesajlar özete katlanır - otel, tarih gibi bilgiler kaybolmaz
+        self.summarizer = ConversationSummarizer(self.client, self.model, self.conversation_store, self.session_id)
+        
         self.gaziantep_rag = None
+        self.unesco_rag = None
+        self.retriever = None  # Gaziantep + UNESCO birleşik arama
         self._setup_gaziantep_rag()
         
         self.load_memory()
     
     def _setup_gaziantep_rag(self):
         try:
-            self.gaziantep_rag = GaziantepRAGSystem()
+            # İlk oturum kurulumu arka planda başlatır, sonraki oturumlar registry'deki motoru alır
+            self.gaziantep_rag = self.resources.get_rag_engine("gaziantep", GaziantepRAGSystem, background=True)
             
-            if self.gaziantep_rag.setup():
-                stats = self.gaziantep_rag.get_stats()
-                print(f"📊 Loaded {stats['places_count']} places in {len(stats['categories'])} categories")
-            else:
-                self.gaziantep_rag = None
+            # UNESCO corpus'u aynı modeli kullanır - ikinci kez yüklenmez
+            self.unesco_rag = self.resources.get_rag_engine("unesco", SimpleRAGSystem, background=True)
+            
+            engines = {'gaziantep': self.gaziantep_rag, 'unesco': self.unesco_rag}
+            available = tuple(sorted(name for name, engine in engines.items() if engine))
+            if available:
+                self.retriever = self.resources.get_or_create(
+                    ("federated",) + available,
+                    lambda: FederatedRetriever(
+                        engines,
+                        labels={'gaziantep': 'Gaziantep Turizm Rehberi', 'unesco': 'UNESCO Dünya Mirası'}
+                    )
+                )
         except Exception as e:
             self.gaziantep_rag = None
     
@@ -146,51 +186,47 @@ class GaziantepRAGWithMemory:
             self.current_language = detected_lang
         return detected_lang
         
-    def save_memory(self):
-        try:
-            memory_data = {
-                'conversation_history': self.conversation_history,
-                'current_language': self.current_language
-            }
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(memory_data, f, ensure_ascii=False, indent=2)
-        except:
-            pass
-
     def load_memory(self):
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    memory_data = json.load(f)
-                    
-                if isinstance(memory_data, list):
-                    self.conversation_history = memory_data
-                    self.current_language = 'tr'
-                else:
-                    self.conversation_history = memory_data.get('conversation_history', [])
-                    self.current_language = memory_data.get('current_language', 'tr')
-            else:
-                self.conversation_history = []
-                self.current_language = 'tr'
-        except:
+            # Özete henüz katılmamış eski mesajlar da yüklenir
+            self.conversation_history = self.conversation_store.load(
+                self.session_id, since=self.summarizer.folded_until)
+            self.current_language = (self.conversation_history[-1].get('language', 'tr')
+                                     if self.conversation_history else 'tr')
+        except OSError:
             self.conversation_history = []
             self.current_language = 'tr'
     
-    def add_to_memory(self, role, content):
-        self.conversation_history.append({
+    def add_to_memory(self, role, content, tool_results=None, error=False):
+        turn = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat(),
             "language": self.current_language
-        })
+        }
+        # API çıktıları ve hatalar ayrı işaretlenir - context builder eski turlarda bunları kısaltır
+        if tool_results:
+            turn["tool_results"] = tool_results
+        if error:
+            turn["error"] = True
+        self.conversation_history.append(turn)
         
         if len(self.conversation_history) > 25:
-            self.conversation_history = self.conversation_history[-25:]
+            # Özet güncellenemediyse pencereden çıkan mesajlar özete katılana kadar tutulur
+            self.conversation_history = self.summarizer.trim(self.conversation_history, 25)
         
-        self.save_memory()
+        # Sadece yeni mesaj oturum dosyasına eklenir
+        try:
+            self.conversation_store.append(self.session_id, turn)
+        except OSError:
+            pass
     
     def search_gaziantep_context(self, user_query):
-        if not self.gaziantep_rag:
+        if not self.retriever:
+            return ""
+        
+        # Motorlar arka planda kuruluyorsa context olmadan devam et
+        if not any(engine.is_searchable() for engine in self.retriever.engines.values()):
             return ""
         
         try:
@@ -199,18 +235,19 @@ class GaziantepRAGWithMemory:
                 'muhammara', 'lahmacun', 'çarşı', 'müze', 'kale', 'cami',
                 'restoran', 'yemek', 'lezzet', 'turizm', 'gezi', 'konaklama',
                 'yol', 'tarif', 'nasıl giderim', 'nerede', 'direction', 'route',
-                'navigate', 'where', 'how to get', 'travel', 'transport'
+                'navigate', 'where', 'how to get', 'travel', 'transport',
+                'unesco', 'heritage', 'miras'
             ]
             
             query_lower = user_query.lower()
             is_gaziantep_related = any(keyword in query_lower for keyword in gaziantep_keywords)
             
             if is_gaziantep_related:
-                results = self.gaziantep_rag.search(user_query, top_k=8, threshold=0.1)
+                results = self.retriever.search(user_query, top_k=8, threshold=0.1)
                 
                 if results:
-                    context = self.gaziantep_rag.format_for_gemini(results, max_context=2000)
-                    return f"\n\n**Gaziantep Turizm Rehberi Bilgileri:**\n{context}\n"
+                    context = self.retriever.format_for_gemini(results, max_context=2000)
+                    return f"\n\n**Turizm Rehberi Bilgileri:**\n{context}\n"
                 
             return ""
                 
@@ -218,16 +255,12 @@ class GaziantepRAGWithMemory:
             return ""
     
     def build_contents_with_memory(self, user_query):
-        contents = []
-        
-        for msg in self.conversation_history:
-            role = "user" if msg["role"] == "user" else "model"
-            contents.append(types.Content(role=role, parts=[types.Part(text=msg["content"])]))
-        
         gaziantep_context = self.search_gaziantep_context(user_query)
         final_query = user_query + gaziantep_context
         
-        contents.append(types.Content(role="user", parts=[types.Part(text=final_query)]))
+        summary, recent_turns = self.summarizer.split(self.conversation_history)
+        contents, self.last_context_stats = self.context_builder.build(recent_turns, final_query, summary=summary)
+        print(ContextBuilder.format_stats(self.last_context_stats))
         return contents
     
     def generate_with_memory(self, user_query):
@@ -237,21 +270,26 @@ class GaziantepRAGWithMemory:
         system_instruction = get_comprehensive_system_instruction(detected_lang, self.instruction_manager)
         tools = self.api_manager.get_tools()
 
-        generate_content_config = types.GenerateContentConfig(
+        # Cache varsa talimat ve tools tekrar gönderilmez, sadece cache adı
+        generate_content_config = self.context_cache.build_config(
+            detected_lang, system_instruction, tools,
             temperature=0.3,
-            top_p=0.95,
-            tools=tools,
-            system_instruction=system_instruction
+            top_p=0.95
         )
         
         try:
             full_response_content = ""
-            function_results = []  # API sonuçlarını topla
+            # Turdaki function call'lar paralel çalışır, sonuçlar sırayla alınır
+            function_calls = self.api_manager.new_batch(self.current_language)
+            tool_results = []  # Memory için - context builder eski turlarda kısaltır
             
             response_stream = self.client.models.generate_content_stream(
                 model=self.model, contents=contents, config=generate_content_config)
 
             for chunk in response_stream:
+                if chunk.usage_metadata and chunk.usage_metadata.prompt_token_count:
+                    self.last_context_stats["prompt_tokens"] = chunk.usage_metadata.prompt_token_count
+                
                 if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
                     for part in chunk.candidates[0].content.parts:
                         if part.function_call:
@@ -259,35 +297,37 @@ class GaziantepRAGWithMemory:
                             function_name = function_call.name
                             function_args = {k: v for k, v in function_call.args.items()}
 
-                            api_data = self.api_manager.handle_function_call(
-                                function_name, function_args, self.current_language)
-                            
-                            function_results.append(api_data)  # Topla, henüz yield etme
-                            full_response_content += api_data + "\n\n"
+                            # Beklemeden başlat, henüz yield etme
+                            function_calls.submit(function_name, function_args)
                         else:
-                            # Text response gelince, önce function results'ları yield et
-                            if function_results:
-                                for result in function_results:
-                                    yield result + "\n\n"
-                                function_results = []  # Temizle
+                            # Text response gelince, önce function results'ları sırayla yield et
+                            for result in function_calls.results():
+                                tool_results.append(result)
+                                yield result + "\n\n"
                             
                             chunk_text = part.text
                             full_response_content += chunk_text
                             yield chunk_text
             
             # Eğer sadece function call varsa ve text response yoksa
-            if function_results:
-                for result in function_results:
-                    yield result + "\n\n"
+            for result in function_calls.results():
+                tool_results.append(result)
+                yield result + "\n\n"
             
             self.add_to_memory("user", user_query)
-            self.add_to_memory("model", full_response_content)
+            self.add_to_memory("model", full_response_content, tool_results=tool_results)
             
         except Exception as e:
+            # Sunucuda süresi dolmuş / silinmiş cache - sonraki istekte yeniden oluşturulur
+            if generate_content_config.cached_content and is_stale_cache_error(e):
+                self.context_cache.invalidate(detected_lang)
             error_msg = f"❌ Error occurred: {str(e)}"
             yield error_msg
             self.add_to_memory("user", user_query)
-            self.add_to_memory("model", error_msg)
+            self.add_to_memory("model", error_msg, error=True)
+        
+        # Yeterince mesaj pencereden çıktıysa özet arka planda güncellenir
+        self.summarizer.update_async(self.conversation_history)
 
 def create_audio_player(audio_bytes):
     if audio_bytes:
@@ -303,16 +343,28 @@ def main():
     st.title("🏛️ Gaziantep Tourism Chatbot")
     st.markdown("*Gaziantep'in lezzetlerini, tarihini ve kültürünü keşfedin! Yol tarifi de alabilirsiniz! Speak or type in any language*")
     
+    # Oturum kimliği URL'de tutulur - sayfa yenilense de bu oturumun geçmişi korunur
+    session_id = resolve_session_id(st.query_params.get("sid"))
+    st.query_params["sid"] = session_id
+    
     if 'rag_bot' not in st.session_state:
         with st.spinner("🏛️ Setting up Gaziantep tourism system..."):
             try:
-                st.session_state.rag_bot = GaziantepRAGWithMemory()
+                st.session_state.rag_bot = GaziantepRAGWithMemory(session_id=session_id)
                 st.success("✅ Gaziantep tourism system ready!")
                 
             except Exception as e:
                 st.error(f"❌ System setup error: {str(e)}")
                 st.stop()
     
+    rag_readiness = st.session_state.rag_bot.resources.get_rag_readiness()
+    pending = {name: state for name, state in rag_readiness.items() if not state["ready"]}
+    if pending:
+        st.caption("⏳ Knowledge base warming up: " + ", ".join(
+            f"{name} {state['progress']:.0%} ({state['error'] or state['stage']})"
+            for name, state in pending.items()
+        ))
+    
     if 'messages' not in st.session_state:
         st.session_state.messages = [
             {"role": "assistant", "content": """🏛️ **Gaziantep Turizm ve Navigasyon Rehberinize Hoş Geldiniz!**
@@ -1,9 +1,98 @@
 # api_manager.py - Universal API Manager with Directions Support - FIXED
-import requests
 import streamlit as st
 from typing import Dict, Any, List, Optional
 from google.genai import types
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import json
+import os
+import threading
+import time
+
+from services.http_client import get_session
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Eski Streamlit - worker thread'lerde st.* çağrıları sadece uyarı verir
+    add_script_run_ctx = get_script_run_ctx = None
+
+# Bir model turundaki function call'lar bu kadar thread'de paralel çalışır (process genelinde)
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "4"))
+WEBHOOK_TIMEOUT = 10  # saniye, webhook isteği başına (varsayılan)
+WEBHOOK_SLOW_TIMEOUT = 15  # saniye, yavaş endpoint'ler (places, directions)
+TOOL_TIMEOUT_MARGIN = 5  # Çağrı zaman aşımı en yavaş webhook isteğinden en az bu kadar uzun olur
+# Saniye, çağrı başına - çalışmaya başladığı andan itibaren (kuyrukta da en fazla bu kadar bekler)
+TOOL_CALL_TIMEOUT = max(float(os.getenv("TOOL_CALL_TIMEOUT", "25")), WEBHOOK_SLOW_TIMEOUT + TOOL_TIMEOUT_MARGIN)
+
+class _PendingCall:
+    """Havuza verilmiş tek bir çağrı - started, worker thread çağrıyı almaya başladığında set edilir"""
+    
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.started = threading.Event()
+        self.future = None
+
+class FunctionCallBatch:
+    """
+    Bir model turunun function call'ları: her çağrı stream'de görüldüğü anda havuzda başlar,
+    results() sonuçları geliş sırasıyla döndürür. Toplam süre en yavaş çağrı kadardır (toplamı değil).
+    Zaman aşımı çağrının çalışmaya başladığı andan sayılır - havuz doluyken kuyrukta bekleyen çağrı
+    süresini harcamaz. Kuyrukta timeout kadar bekleyip başlayamayan çağrı iptal edilir; çalışırken
+    süresi dolan çağrı için zaman aşımı mesajı döner, thread webhook timeout'u ile bitip havuza geri döner.
+    """
+    
+    def __init__(self, api_manager: "APIManager", current_language: str = "tr", timeout: float = TOOL_CALL_TIMEOUT):
+        self.api_manager = api_manager
+        self.current_language = current_language
+        self.timeout = timeout
+        self._calls: List[_PendingCall] = []
+        # st.info vb. çağrıların worker thread'lerden de bu oturumun sayfasına yazabilmesi için
+        self._ctx = get_script_run_ctx() if get_script_run_ctx else None
+    
+    def __len__(self):
+        return len(self._calls)
+    
+    def _run(self, call: _PendingCall, function_args: Dict[str, Any]) -> str:
+        call.started_at = time.monotonic()
+        call.started.set()
+        if self._ctx is not None:
+            add_script_run_ctx(threading.current_thread(), self._ctx)
+        return self.api_manager.handle_function_call(call.function_name, function_args, self.current_language)
+    
+    def submit(self, function_name: str, function_args: Dict[str, Any]):
+        """Çağrıyı hemen başlat - sonucu beklemeden stream okunmaya devam eder"""
+        call = _PendingCall(function_name)
+        call.future = self.api_manager.executor.submit(self._run, call, function_args)
+        self._calls.append(call)
+    
+    def _result(self, call: _PendingCall) -> str:
+        # Kuyrukta bekleme: submit'ten itibaren en fazla timeout, sonra iptal (havuzdaki yeri boşalır)
+        queue_deadline = call.submitted_at + self.timeout
+        while not call.started.is_set() and not call.future.done():
+            remaining = queue_deadline - time.monotonic()
+            if remaining <= 0:
+                if call.future.cancel():
+                    return f"⚠️ {call.function_name} başlatılamadı - işlem kuyruğu dolu ({self.timeout:g}s)"
+                break  # Tam bu anda başladı
+            call.started.wait(remaining)
+        
+        started_at = call.started_at if call.started_at is not None else time.monotonic()
+        try:
+            return call.future.result(timeout=max(0.0, started_at + self.timeout - time.monotonic()))
+        except FutureTimeoutError:
+            return f"⚠️ {call.function_name} zaman aşımı ({self.timeout:g}s)"
+    
+    def results(self) -> List[str]:
+        """Bekleyen çağrıların sonuçları, submit sırasıyla - çağrı başına zaman aşımı uygulanır"""
+        results = []
+        for call in self._calls:
+            try:
+                results.append(self._result(call))
+            except Exception as e:
+                results.append(f"❌ {call.function_name} hatası: {str(e)}")
+        self._calls = []
+        return results
 
 class APIManager:
     """Tüm webhook API çağrılarını ve function handling'i yöneten tek sınıf - Directions desteği eklendi"""
@@ -12,13 +101,15 @@ class APIManager:
         self.webhook_url = webhook_url
         self.available_functions = {}
         self.function_declarations = []
+        self._executor = None
+        self._executor_lock = threading.Lock()
         self._load_functions()
     
     def _load_functions(self):
         """Webhook'tan mevcut function'ları otomatik yükle - FİX: Declarations format"""
         try:
             print(f"🔧 DEBUG: Trying to load functions from {self.webhook_url}/functions")
-            response = requests.get(f"{self.webhook_url}/functions", timeout=5)
+            response = get_session().get(f"{self.webhook_url}/functions", timeout=5)
             if response.status_code == 200:
                 functions_data = response.json()
                 self.available_functions = functions_data.get("functions", {})
@@ -253,11 +344,11 @@ class APIManager:
             print("❌ DEBUG: No function declarations available")
             return []
     
-    def call_webhook_universal(self, endpoint: str, payload: Dict[str, Any], timeout: int = 10) -> Dict[str, Any]:
+    def call_webhook_universal(self, endpoint: str, payload: Dict[str, Any], timeout: int = WEBHOOK_TIMEOUT) -> Dict[str, Any]:
         """Universal webhook çağrısı - tüm API'ler için tek fonksiyon"""
         try:
             url = f"{self.webhook_url}{endpoint}"
-            response = requests.post(url, json=payload, timeout=timeout)
+            response = get_session().post(url, json=payload, timeout=timeout)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -294,6 +385,19 @@ class APIManager:
         except Exception as e:
             return f"❌ {function_name} hatası: {str(e)}"
     
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Function call'lar için sınırlı thread havuzu - ilk paralel çağrıda oluşturulur"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+        return self._executor
+    
+    def new_batch(self, current_language: str = "tr", timeout: float = TOOL_CALL_TIMEOUT) -> FunctionCallBatch:
+        """Bir model turunun function call'larını paralel çalıştıracak batch"""
+        return FunctionCallBatch(self, current_language, timeout)
+    
     def _handle_weather(self, args: Dict[str, Any], language: str, endpoint: str) -> str:
         """Weather API işlemi"""
         city = args.get("city_name")
@@ -356,7 +460,7 @@ class APIManager:
             "location_bias": location
         }
         
-        result = self.call_webhook_universal(endpoint, payload, timeout=15)
+        result = self.call_webhook_universal(endpoint, payload, timeout=WEBHOOK_SLOW_TIMEOUT)
         return self._format_response(result, "Places")
     
     # YENİ: Directions handler
@@ -409,7 +513,7 @@ class APIManager:
             "language": language
         }
         
-        result = self.call_webhook_universal(endpoint, payload, timeout=15)
+        result = self.call_webhook_universal(endpoint, payload, timeout=WEBHOOK_SLOW_TIMEOUT)
         return self._format_response(result, "Directions")
     
     def _handle_generic(self, args: Dict[str, Any], endpoint: str, function_name: str) -> str:
@@ -439,7 +543,9 @@ class APIManager:
             "available_functions": len(self.available_functions),
             "function_names": list(self.available_functions.keys()),
             "declarations_loaded": len(self.function_declarations),
-            "directions_enabled": "get_directions" in self.available_functions
+            "directions_enabled": "get_directions" in self.available_functions,
+            "tool_workers": TOOL_MAX_WORKERS,
+            "tool_call_timeout": TOOL_CALL_TIMEOUT
         }
     
     def reload_functions(self):
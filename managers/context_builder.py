@@ -0,0 +1,110 @@
+# context_builder.py - Token bütçeli konuşma geçmişi (Gemini contents) oluşturucu
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from google.genai import types
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_KEEP_RECENT = int(os.getenv("CONTEXT_KEEP_RECENT", "4"))
+TOOL_RESULT_CHARS = 300  # Eski turlardaki API çıktılarının kısaltılmış uzunluğu
+ERROR_PLACEHOLDER = "[Bu yanıt bir hata nedeniyle üretilemedi]"
+SUMMARY_TEMPLATE = "[ÖNCEKİ KONUŞMA ÖZETİ]\n{summary}\n[/ÖNCEKİ KONUŞMA ÖZETİ]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Kaba token tahmini (~4 karakter/token) - her turda count_tokens API çağrısı yapmamak için"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def is_error_turn(turn: Dict) -> bool:
+    """Hata yanıtı mı - yeni kayıtlarda 'error' alanı, eskilerde '❌' önekiyle saklanan hata metni (429 vb.)"""
+    return turn.get("error", False) or (turn.get("role") == "model" and turn.get("content", "").startswith("❌"))
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + " …[kısaltıldı]"
+
+
+class ContextBuilder:
+    """
+    Konuşma geçmişini token bütçesine sığdırarak Gemini contents listesine çevirir:
+    - Son keep_recent mesaj olduğu gibi gönderilir (hata yanıtları hariç)
+    - Daha eski mesajlar yeniden eskiye, bütçe bitene kadar eklenir; API çıktıları kısaltılır
+    - Hata yanıtları (429 RESOURCE_EXHAUSTED blob'ları vb.) tek satırlık bir nota indirilir
+    Her çağrı gönderilen token sayısını raporlar.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, keep_recent: int = CONTEXT_KEEP_RECENT,
+                 tool_result_chars: int = TOOL_RESULT_CHARS,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.tool_result_chars = tool_result_chars
+        self.count_tokens = count_tokens
+
+    def render_turn(self, turn: Dict, verbatim: bool) -> str:
+        """Mesajı Gemini'ye gidecek metne çevir - API çıktıları eski turlarda kısaltılır"""
+        if is_error_turn(turn):
+            return ERROR_PLACEHOLDER
+
+        tool_results = turn.get("tool_results") or []
+        if not verbatim:
+            tool_results = [_truncate(result, self.tool_result_chars) for result in tool_results]
+        return "\n\n".join(tool_results + [turn.get("content", "")]).strip()
+
+    def build(self, history: List[Dict], final_query: str,
+              summary: Optional[str] = None) -> Tuple[List[types.Content], Dict]:
+        """
+        Bütçeye sığan geçmiş + son kullanıcı mesajı; (contents, stats) döndürür.
+        summary verilirse (özetlenmiş eski turlar) en başa eklenir ve bütçeden önce düşülür.
+        """
+        query_tokens = self.count_tokens(final_query)
+        summary_text = SUMMARY_TEMPLATE.format(summary=summary) if summary else ""
+        summary_tokens = self.count_tokens(summary_text)
+        remaining = self.token_budget - query_tokens - summary_tokens
+
+        selected = []  # (turn, text) - yeniden eskiye
+        dropped = truncated = 0
+        for position, turn in enumerate(reversed(history)):
+            recent = position < self.keep_recent
+            text = self.render_turn(turn, verbatim=recent)
+            tokens = self.count_tokens(text)
+
+            if not recent and tokens > remaining:
+                # Bütçe doldu - daha eski mesajlar gönderilmez
+                dropped = len(history) - position
+                break
+
+            if is_error_turn(turn) or (not recent and any(
+                    len(result) > self.tool_result_chars for result in turn.get("tool_results") or [])):
+                truncated += 1
+            remaining -= tokens
+            selected.append((turn, text))
+
+        contents = [
+            types.Content(role="user" if turn["role"] == "user" else "model", parts=[types.Part(text=text)])
+            for turn, text in reversed(selected)
+        ]
+        if summary_text:
+            contents.insert(0, types.Content(role="user", parts=[types.Part(text=summary_text)]))
+        contents.append(types.Content(role="user", parts=[types.Part(text=final_query)]))
+
+        stats = {
+            "tokens": self.token_budget - remaining,
+            "history_tokens": self.token_budget - remaining - query_tokens - summary_tokens,
+            "summary_tokens": summary_tokens,
+            "query_tokens": query_tokens,
+            "budget": self.token_budget,
+            "turns_sent": len(selected),
+            "turns_dropped": dropped,
+            "turns_truncated": truncated
+        }
+        return contents, stats
+
+    @staticmethod
+    def format_stats(stats: Optional[Dict]) -> str:
+        if not stats:
+            return ""
+        return (f"📏 Context: ~{stats['tokens']} tokens / {stats['budget']} "
+                f"({stats['turns_sent']} turns sent, {stats['turns_dropped']} dropped, "
+                f"{stats['turns_truncated']} truncated)")
@@ -0,0 +1,360 @@
+# context_cache_manager.py - Sistem talimatı + tool şeması için Gemini context cache yönetimi
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from google.genai import errors, types
+
+from managers.context_builder import estimate_tokens
+
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE", "1") != "0"
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "3600"))  # saniye
+# Gemini belirli bir boyutun altındaki içerikleri cache'lemez - altındaysa istek inline gönderilir
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+# İsteğe bağlı corpus özeti (düz metin) - cache'e talimatla birlikte eklenir
+CONTEXT_CACHE_CORPUS_FILE = os.getenv("CONTEXT_CACHE_CORPUS_FILE")
+REFRESH_MARGIN_SECONDS = 300  # TTL bitimine bu kadar kala süre uzatılır
+RETRY_AFTER_SECONDS = 600  # Oluşturma başarısızsa bu süre inline devam edilir
+
+
+def _dump(value) -> object:
+    """Pydantic (types.*) nesnelerini parmak izi için JSON'a çevir"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    return repr(value)
+
+
+def is_stale_cache_error(error: Exception) -> bool:
+    """
+    Cached content sunucuda yok (süresi dolmuş / silinmiş) hatası mı - genai ClientError'ın status kodundan:
+    404 NOT_FOUND ya da mesajında cached content geçen 400 / 403 (Gemini bu durumda 403 de döndürüyor)
+    """
+    if not isinstance(error, errors.ClientError):
+        return False
+    if error.code == 404 or error.status == "NOT_FOUND":
+        return True
+    message = (error.message or "").lower().replace("_", "")
+    return error.code in (400, 403) and "cachedcontent" in message
+
+
+class LocalCacheStore:
+    """
+    client.caches'in bellek içi karşılığı (create / get / update / delete) - test_context_cache() ve offline
+    geliştirme için.
+    Gemini'ye istek atmaz; oluşturulan cache'lerin config'i inceleme için saklanır.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Dict] = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expire_time(ttl: str) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=float(ttl.rstrip("s")))
+
+    def create(self, model: str, config: types.CreateCachedContentConfig) -> types.CachedContent:
+        with self._lock:
+            self._counter += 1
+            name = f"cachedContents/local-{self._counter}"
+            cached = types.CachedContent(name=name, model=model, display_name=config.display_name,
+                                         expire_time=self._expire_time(config.ttl))
+            self.entries[name] = {"cached": cached, "config": config}
+            return cached
+
+    def get(self, name: str) -> types.CachedContent:
+        entry = self.entries.get(name)
+        if entry is None or entry["cached"].expire_time <= datetime.now(timezone.utc):
+            raise KeyError(f"Cached content not found: {name}")
+        return entry["cached"]
+
+    def update(self, name: str, config: types.UpdateCachedContentConfig) -> types.CachedContent:
+        cached = self.get(name)
+        cached.expire_time = self._expire_time(config.ttl)
+        return cached
+
+    def delete(self, name: str):
+        self.entries.pop(name, None)
+
+
+class ContextCacheManager:
+    """
+    Her istekte değişmeyen ön ek (dil başına sistem talimatı + tool şeması + isteğe bağlı corpus özeti)
+    Gemini'de cached content olarak bir kez oluşturulur, istekler ona adıyla referans verir.
+    İçerik değişirse (parmak izi) yeni cache oluşturulup eskisi silinir; TTL bitmeden süre uzatılır.
+    Cache oluşturulamazsa (boyut altı, desteklenmeyen model, kota) istek eskisi gibi inline gönderilir.
+    """
+
+    def __init__(self, client, model: str, caches=None, ttl: int = CONTEXT_CACHE_TTL,
+                 min_tokens: int = CONTEXT_CACHE_MIN_TOKENS, enabled: bool = CONTEXT_CACHE_ENABLED,
+                 corpus_summary: Optional[str] = None):
+        self.model = model
+        self.caches = caches if caches is not None else client.caches
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self.corpus_summary = corpus_summary if corpus_summary is not None else self._load_corpus_summary()
+
+        # Aynı içerik (örn. aynı talimatı kullanan diller) tek cache paylaşır - anahtar parmak izi
+        self._entries: Dict[str, Dict] = {}  # parmak izi -> {"name", "expires_at"}
+        self._languages: Dict[str, str] = {}  # dil -> parmak izi
+        self._skip_until: Dict[str, float] = {}  # parmak izi -> inline devam edilecek süre sonu
+        self._fingerprint_locks: Dict[str, threading.Lock] = {}  # parmak izi başına tek oluşturma/yenileme
+        self._lock = threading.Lock()  # Sadece sözlükler için - ağ çağrıları bu kilit tutulurken yapılmaz
+        self.hits = 0
+        self.creates = 0
+        self.refreshes = 0
+        self.inline = 0
+        self.failures = 0
+
+    @staticmethod
+    def _load_corpus_summary() -> Optional[str]:
+        if not CONTEXT_CACHE_CORPUS_FILE:
+            return None
+        try:
+            with open(CONTEXT_CACHE_CORPUS_FILE, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError as e:
+            print(f"⚠️ Corpus summary unreadable: {e}")
+            return None
+
+    @staticmethod
+    def _fingerprint(model: str, system_instruction: str, tools: List[types.Tool],
+                     corpus_summary: Optional[str]) -> str:
+        payload = json.dumps([model, system_instruction, [_dump(tool) for tool in tools or []], corpus_summary],
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _prefix_tokens(self, system_instruction: str, tools: List[types.Tool], corpus_summary: Optional[str]) -> int:
+        tool_text = json.dumps([_dump(tool) for tool in tools or []], ensure_ascii=False)
+        return estimate_tokens(system_instruction) + estimate_tokens(tool_text) + estimate_tokens(corpus_summary or "")
+
+    def _create(self, language: str, fingerprint: str, system_instruction: str, tools: List[types.Tool],
+                corpus_summary: Optional[str]) -> Dict:
+        """Sunucuda cache oluştur (ağ çağrısı - self._lock tutulmadan çağrılır)"""
+        contents = None
+        if corpus_summary:
+            contents = [types.Content(role="user", parts=[types.Part(text=corpus_summary)])]
+        cached = self.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"tourism-{language}-{fingerprint[:12]}",
+                system_instruction=system_instruction,
+                tools=tools or None,
+                contents=contents,
+                ttl=f"{self.ttl}s"
+            )
+        )
+        print(f"🗄️ Context cache created for '{language}': {cached.name}")
+        return {"name": cached.name, "expires_at": time.time() + self.ttl}
+
+    def _refresh(self, entry: Dict) -> Optional[Dict]:
+        """TTL'i uzat (ağ çağrısı) - sunucuda süresi dolmuş ya da silinmişse None"""
+        try:
+            self.caches.update(name=entry["name"], config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+        except Exception:
+            return None
+        return {"name": entry["name"], "expires_at": time.time() + self.ttl}
+
+    def _delete(self, name: str):
+        try:
+            self.caches.delete(name=name)
+        except Exception as e:
+            print(f"⚠️ Context cache delete failed ({name}): {e}")
+
+    def _fingerprint_lock(self, fingerprint: str) -> threading.Lock:
+        with self._lock:
+            lock = self._fingerprint_locks.get(fingerprint)
+            if lock is None:
+                lock = threading.Lock()
+                self._fingerprint_locks[fingerprint] = lock
+            return lock
+
+    def get_cache_name(self, language: str, system_instruction: str, tools: List[types.Tool],
+                       corpus_summary: Optional[str] = None) -> Optional[str]:
+        """
+        Dil için geçerli cache adını döndür (gerekirse oluştur / süresini uzat) - kullanılamıyorsa None.
+        Karar self._lock altında verilir, ağ çağrıları kilit dışında yapılır ve sonuç kilitle yayınlanır;
+        yavaş bir cache çağrısı diğer oturumları / dilleri ve cache hit'leri bekletmez.
+        """
+        if not self.enabled:
+            return None
+        corpus_summary = corpus_summary if corpus_summary is not None else self.corpus_summary
+        fingerprint = self._fingerprint(self.model, system_instruction, tools, corpus_summary)
+
+        orphan = None
+        with self._lock:
+            if self._skip_until.get(fingerprint, 0) > time.time():
+                return None
+
+            previous = self._languages.get(language)
+            self._languages[language] = fingerprint
+            if previous is not None and previous != fingerprint and previous not in self._languages.values():
+                # Talimat ya da tool şeması değişti - eski cache'i kullanan dil kalmadı
+                orphan = self._entries.pop(previous, None)
+
+            entry = self._entries.get(fingerprint)
+            hit = entry is not None and entry["expires_at"] - time.time() >= REFRESH_MARGIN_SECONDS
+            if hit:
+                self.hits += 1
+
+        if orphan is not None:
+            self._delete(orphan["name"])
+        if hit:
+            return entry["name"]
+
+        if entry is None and self._prefix_tokens(system_instruction, tools, corpus_summary) < self.min_tokens:
+            with self._lock:
+                self._skip_until[fingerprint] = float("inf")
+            return None
+
+        # Aynı parmak izi için tek oluşturma/yenileme - o sırada gelen istekler beklemez:
+        # süresi uzatılmakta olan cache hala geçerli, oluşturulmakta olan için istek inline gider
+        lock = self._fingerprint_lock(fingerprint)
+        if not lock.acquire(blocking=False):
+            return entry["name"] if entry is not None else None
+        try:
+            with self._lock:
+                current = self._entries.get(fingerprint)
+            if current is not None and current is not entry:
+                # Başka bir thread bu arada oluşturdu/yeniledi
+                return current["name"]
+
+            refreshed = self._refresh(entry) if entry is not None else None
+            try:
+                created = None if refreshed else self._create(language, fingerprint, system_instruction,
+                                                              tools, corpus_summary)
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self._entries.pop(fingerprint, None)
+                    self._skip_until[fingerprint] = time.time() + RETRY_AFTER_SECONDS
+                print(f"⚠️ Context cache unavailable for '{language}', sending inline: {e}")
+                return None
+
+            with self._lock:
+                if refreshed:
+                    self.refreshes += 1
+                else:
+                    self.creates += 1
+                self._entries[fingerprint] = refreshed or created
+            return (refreshed or created)["name"]
+        finally:
+            lock.release()
+
+    def build_config(self, language: str, system_instruction: str, tools: List[types.Tool],
+                     corpus_summary: Optional[str] = None, **generation) -> types.GenerateContentConfig:
+        """
+        GenerateContentConfig - cache varsa sadece adıyla referans verir (talimat ve tools tekrar gönderilmez),
+        yoksa talimat, tools ve corpus özeti inline gönderilir.
+        """
+        cache_name = self.get_cache_name(language, system_instruction, tools, corpus_summary)
+        if cache_name:
+            return types.GenerateContentConfig(cached_content=cache_name, **generation)
+
+        self.inline += 1
+        corpus_summary = corpus_summary if corpus_summary is not None else self.corpus_summary
+        if corpus_summary:
+            system_instruction = f"{system_instruction}\n\n{corpus_summary}"
+        return types.GenerateContentConfig(system_instruction=system_instruction, tools=tools, **generation)
+
+    def invalidate(self, language: str):
+        """Dilin cache'ini unut - sonraki istek yeniden oluşturur (sunucuda silinmiş cache hatası sonrası)"""
+        with self._lock:
+            fingerprint = self._languages.get(language)
+            if fingerprint is not None:
+                self._entries.pop(fingerprint, None)
+
+    def clear(self):
+        """Tüm cache'leri sunucudan sil (silme çağrıları kilit dışında)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._languages.clear()
+            self._skip_until.clear()
+        for entry in entries:
+            self._delete(entry["name"])
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "caches": {language: self._entries[fingerprint]["name"]
+                       for language, fingerprint in self._languages.items() if fingerprint in self._entries},
+            "hits": self.hits,
+            "creates": self.creates,
+            "refreshes": self.refreshes,
+            "inline": self.inline,
+            "failures": self.failures
+        }
+
+
+def test_context_cache():
+    """ContextCacheManager'ı LocalCacheStore ile test et - oluşturma, hit, yenileme, içerik değişimi, inline düşüş"""
+
+    print("🧪 Context cache test başlıyor...")
+    store = LocalCacheStore()
+    manager = ContextCacheManager(client=None, model="test-model", caches=store, min_tokens=10,
+                                  enabled=True, corpus_summary="")
+    instruction = "Sen Gaziantep turizm asistanısın. " * 20
+
+    def check(label: str, condition: bool):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            raise AssertionError(label)
+
+    # Oluşturma ve hit - aynı içerikli diller tek cache paylaşır
+    config = manager.build_config("tr", instruction, [])
+    name = config.cached_content
+    check("Cache oluşturuldu", name in store.entries and config.system_instruction is None)
+    check("Aynı içerik tekrar kullanıldı", manager.build_config("en", instruction, []).cached_content == name)
+    check("Tek create", manager.creates == 1 and manager.hits == 1)
+
+    # TTL bitimine az kalınca süre uzatılır
+    fingerprint = manager._languages["tr"]
+    manager._entries[fingerprint]["expires_at"] = time.time() + REFRESH_MARGIN_SECONDS - 1
+    check("Süre uzatıldı", manager.get_cache_name("tr", instruction, []) == name and manager.refreshes == 1)
+
+    # Sunucuda silinmiş cache - yenileme başarısız, yeniden oluşturulur
+    store.delete(name)
+    manager._entries[fingerprint]["expires_at"] = time.time()
+    recreated = manager.get_cache_name("tr", instruction, [])
+    check("Silinmiş cache yeniden oluşturuldu", recreated != name and recreated in store.entries)
+
+    # Talimat değişti - yeni cache, eskisini kullanan dil kalmayınca sunucudan silinir
+    changed = manager.get_cache_name("tr", instruction + " Yeni kural.", [])
+    check("İçerik değişince yeni cache", changed not in (name, recreated))
+    manager.get_cache_name("en", instruction + " Yeni kural.", [])
+    check("Eski cache silindi", recreated not in store.entries)
+
+    # Boyut altı içerik - inline gönderilir
+    small = manager.build_config("tr", "Kısa talimat", [])
+    check("Küçük içerik inline", small.cached_content is None and small.system_instruction == "Kısa talimat")
+
+    # Oluşturma hatası - inline devam, RETRY_AFTER_SECONDS boyunca tekrar denenmez
+    failing = ContextCacheManager(client=None, model="test-model", caches=LocalCacheStore(), min_tokens=10,
+                                  enabled=True, corpus_summary="")
+    failing.caches.create = lambda **kwargs: (_ for _ in ()).throw(RuntimeError("quota"))
+    fallback = failing.build_config("tr", instruction, [])
+    check("Hata sonrası inline", fallback.cached_content is None and failing.failures == 1)
+    failing.build_config("tr", instruction, [])
+    check("Hata sonrası tekrar denenmedi", failing.failures == 1)
+
+    # Cache hatası sınıflandırması - sadece status koduna göre
+    check("404 cache hatası", is_stale_cache_error(errors.ClientError(404, {"error": {"status": "NOT_FOUND"}})))
+    check("403 CachedContent hatası", is_stale_cache_error(errors.ClientError(
+        403, {"error": {"status": "PERMISSION_DENIED", "message": "CachedContent not found (or permission denied)"}})))
+    check("İlgisiz hatalar cache hatası değil", not is_stale_cache_error(RuntimeError("cache miss in webhook"))
+          and not is_stale_cache_error(errors.ClientError(
+              429, {"error": {"status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded for cache tokens"}})))
+
+    manager.clear()
+    check("clear() tüm cache'leri sildi", not store.entries)
+    print(f"\n📊 Stats: {manager.get_stats()}")
+
+
+if __name__ == "__main__":
+    test_context_cache()
@@ -0,0 +1,259 @@
+# conversation_store.py - Oturum başına append-only JSONL konuşma geçmişi
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, TextIO
+
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    """Session ID dosya adı olarak güvenli mi (path traversal yok)"""
+    return bool(session_id) and bool(_SESSION_ID_PATTERN.match(session_id))
+
+
+def resolve_session_id(candidate: Optional[str] = None) -> str:
+    """Geçerliyse verilen ID'yi (örn. URL'den), değilse yeni bir session ID döndür"""
+    return candidate if is_valid_session_id(candidate) else uuid.uuid4().hex
+
+
+def retained_start(timestamps: List[str], max_turns: int, since: Optional[str] = None,
+                   max_pending: Optional[int] = None) -> int:
+    """
+    Saklanacak ilk mesajın indeksi: son max_turns mesaj, since verilirse ondan yeni (henüz özete
+    katılmamış) mesajlar da - toplam en fazla max_pending. Sınır aşılırsa atılan özetlenmemiş mesajlar loglanır.
+    """
+    start = max(0, len(timestamps) - max_turns)
+    if since is None:
+        return start
+    pending_start = next((i for i, ts in enumerate(timestamps) if ts > since), len(timestamps))
+    if pending_start >= start:
+        return start
+    floor = max(0, len(timestamps) - max_pending) if max_pending else 0
+    if pending_start < floor:
+        print(f"⚠️ {floor - pending_start} unsummarized turns dropped (summary pending too long)")
+    return max(pending_start, floor)
+
+
+class ConversationStore:
+    """
+    Her oturumun geçmişi ayrı bir <root_dir>/<session_id>.jsonl dosyasında, satır başına bir mesaj.
+    Mesaj eklemek O(1): açık dosyanın sonuna tek satır yazılır (tüm geçmiş yeniden yazılmaz).
+    fsync toplu yapılır - fsync_every mesajda ya da fsync_interval saniyede bir; flush her yazımda
+    yapıldığı için process çökse de veri OS'ta kalır, sadece güç kaybında son birkaç mesaj gidebilir.
+    Dosya max_turns * compact_factor satırı geçince son max_turns mesaja sıkıştırılır; retention_days'ten
+    eski oturum dosyaları silinir.
+    Oturumun özeti varsa (<session_id>.summary.json) özete henüz katılmamış mesajlar sıkıştırmada
+    ve load(since=...) ile max_pending_turns'e kadar korunur - özet güncellemesi başarısız olsa da kaybolmaz.
+    """
+
+    def __init__(self, root_dir: str, max_turns: int = 25, fsync_every: int = 8,
+                 fsync_interval: float = 2.0, compact_factor: int = 4,
+                 retention_days: float = 30, max_open_files: int = 256, max_pending_turns: int = 50):
+        self.root_dir = root_dir
+        self.max_turns = max_turns
+        # Sıkıştırma sonrası dosya eşiğin altında kalmalı - yoksa her mesajda yeniden sıkıştırılır
+        self.max_pending_turns = max(max_turns, min(max_pending_turns, max_turns * (compact_factor - 1)))
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_factor = compact_factor
+        self.retention_days = retention_days
+        self.max_open_files = max_open_files
+
+        self._handles: "OrderedDict[str, TextIO]" = OrderedDict()
+        self._line_counts: Dict[str, int] = {}
+        self._unsynced: set = set()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self.appends = 0
+        self.compactions = 0
+
+        os.makedirs(root_dir, exist_ok=True)
+        self.prune()
+        atexit.register(self.close)
+
+    def _path(self, session_id: str) -> str:
+        if not is_valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return os.path.join(self.root_dir, f"{session_id}.jsonl")
+
+    def _read_lines(self, session_id: str) -> List[str]:
+        try:
+            with open(self._path(session_id), "r", encoding="utf-8") as f:
+                return f.readlines()
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _parse(lines: List[str]) -> List[Optional[Dict]]:
+        """Satırları parse et - yarım kalmış (bozuk) satırlar None"""
+        turns = []
+        for line in lines:
+            try:
+                turns.append(json.loads(line))
+            except json.JSONDecodeError:
+                turns.append(None)
+        return turns
+
+    def load(self, session_id: str, since: Optional[str] = None) -> List[Dict]:
+        """
+        Oturumun son max_turns mesajı; since (özete katılan son mesajın timestamp'i) verilirse
+        ondan yeni tüm mesajlar da (en fazla max_pending_turns) - yarım kalmış satırlar atlanır
+        """
+        with self._lock:
+            lines = self._read_lines(session_id)
+            self._line_counts[session_id] = len(lines)
+
+        turns = self._parse(lines)
+        start = retained_start([(turn or {}).get("timestamp", "") for turn in turns],
+                               self.max_turns, since, self.max_pending_turns)
+        return [turn for turn in turns[start:] if turn is not None]
+
+    def append(self, session_id: str, turn: Dict):
+        """Mesajı oturum dosyasının sonuna ekle"""
+        line = json.dumps(turn, ensure_ascii=False) + "\n"
+        with self._lock:
+            handle = self._handle(session_id)
+            handle.write(line)
+            handle.flush()
+            self.appends += 1
+            self._unsynced.add(session_id)
+            self._pending += 1
+            self._line_counts[session_id] = self._line_counts.get(session_id, 0) + 1
+
+            if self._line_counts[session_id] > self.max_turns * self.compact_factor:
+                self._compact(session_id)
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _handle(self, session_id: str) -> TextIO:
+        handle = self._handles.get(session_id)
+        if handle is not None:
+            self._handles.move_to_end(session_id)
+            return handle
+
+        if session_id not in self._line_counts:
+            self._line_counts[session_id] = len(self._read_lines(session_id))
+
+        # Açık dosya sayısı sınırlı - en eski kullanılan kapatılır
+        while len(self._handles) >= self.max_open_files:
+            old_id, old_handle = self._handles.popitem(last=False)
+            self._close_handle(old_id, old_handle)
+
+        path = self._path(session_id)
+        handle = open(path, "a", encoding="utf-8")
+        if handle.tell() and not self._ends_with_newline(path):
+            # Çökme sonrası yarım kalmış son satır bir sonraki mesajı bozmasın
+            handle.write("\n")
+        self._handles[session_id] = handle
+        return handle
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _close_handle(self, session_id: str, handle: TextIO):
+        if session_id in self._unsynced:
+            os.fsync(handle.fileno())
+            self._unsynced.discard(session_id)
+        handle.close()
+
+    def _sync(self):
+        for session_id in list(self._unsynced):
+            handle = self._handles.get(session_id)
+            if handle is not None:
+                os.fsync(handle.fileno())
+        self._unsynced.clear()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _compact(self, session_id: str):
+        """
+        Dosyayı son max_turns satıra (+ özete henüz katılmamış satırlara) indir -
+        tmp + os.replace ile atomik (amortize O(1))
+        """
+        handle = self._handles.pop(session_id, None)
+        if handle is not None:
+            self._close_handle(session_id, handle)
+
+        path = self._path(session_id)
+        lines = self._read_lines(session_id)
+        summary = self.load_summary(session_id)
+        since = summary.get("folded_until", "") if summary is not None else None
+        timestamps = [(turn or {}).get("timestamp", "") for turn in self._parse(lines)]
+        lines = lines[retained_start(timestamps, self.max_turns, since, self.max_pending_turns):]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        self._line_counts[session_id] = len(lines)
+        self.compactions += 1
+
+    def _summary_path(self, session_id: str) -> str:
+        return self._path(session_id)[:-len(".jsonl")] + ".summary.json"
+
+    def load_summary(self, session_id: str) -> Optional[Dict]:
+        """Oturumun kayıtlı konuşma özeti - yoksa ya da okunamazsa None"""
+        try:
+            with open(self._summary_path(session_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save_summary(self, session_id: str, summary: Dict):
+        """Özeti tmp + os.replace ile atomik yaz (özet her güncellemede tümüyle değişir)"""
+        path = self._summary_path(session_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """Bekleyen yazımları diske zorla"""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            for session_id, handle in list(self._handles.items()):
+                self._close_handle(session_id, handle)
+            self._handles.clear()
+
+    def prune(self) -> int:
+        """retention_days'ten uzun süredir yazılmamış oturum dosyalarını sil"""
+        cutoff = time.time() - self.retention_days * 86400
+        removed = 0
+        for name in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, name)
+            session_id = name.split(".", 1)[0]
+            if not name.endswith((".jsonl", ".summary.json")) or session_id in self._handles:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            print(f"🧹 Conversation store: {removed} expired sessions removed")
+        return removed
+
+    def get_stats(self) -> Dict:
+        return {
+            "root_dir": self.root_dir,
+            "open_sessions": len(self._handles),
+            "appends": self.appends,
+            "compactions": self.compactions,
+            "pending_fsync": self._pending
+        }
@@ -0,0 +1,149 @@
+# conversation_summarizer.py - Pencereden çıkan eski turları kısa bir özete katlayan artımlı özetleyici
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from google.genai import types
+
+from managers.context_builder import ContextBuilder, is_error_turn
+from managers.conversation_store import retained_start
+
+SUMMARY_WINDOW = int(os.getenv("SUMMARY_WINDOW", "8"))  # Özetlenmeden gönderilen son mesaj sayısı
+SUMMARY_FOLD_BATCH = int(os.getenv("SUMMARY_FOLD_BATCH", "4"))  # Özet bu kadar mesaj birikince güncellenir
+SUMMARY_MAX_TOKENS = 400
+
+SUMMARY_PROMPT = """Aşağıda bir turizm asistanı ile kullanıcı arasındaki konuşmanın mevcut özeti ve özete henüz eklenmemiş mesajlar var.
+Özeti güncelle. Kullanıcının kaldığı otel ve konumu, seyahat tarihleri, kişi sayısı, bütçe, tercihler, sorduğu yerler
+ve asistanın verdiği somut bilgiler (adres, fiyat, saat, rota) gibi olguları koru; selamlaşmaları ve tekrarları at.
+Yeni bilgi eskisiyle çelişiyorsa yenisini yaz. En fazla 150 kelime, madde işaretli, kullanıcının dilinde yaz.
+Sadece güncellenmiş özeti döndür.
+
+[MEVCUT ÖZET]
+{summary}
+
+[YENİ MESAJLAR]
+{turns}"""
+
+
+class ConversationSummarizer:
+    """
+    Oturum başına çalışan özet: son `window` mesaj olduğu gibi kalır, daha eskileri tek bir özet metnine katlanır.
+    Özet cache'lenir (bellekte + ConversationStore'da <session_id>.summary.json) ve sadece pencereden en az
+    `fold_batch` yeni mesaj çıktığında tek bir Gemini çağrısıyla güncellenir - her turda özet üretilmez.
+    Güncelleme arka plan thread'inde yapılır; başarısız olursa eski özet kullanılmaya devam eder ve
+    özete katılamayan mesajlar (trim / store sıkıştırması sırasında) özet güncellenene kadar saklanır.
+    """
+
+    def __init__(self, client, model: str, store, session_id: str, window: int = SUMMARY_WINDOW,
+                 fold_batch: int = SUMMARY_FOLD_BATCH, max_tokens: int = SUMMARY_MAX_TOKENS):
+        self.client = client
+        self.model = model
+        self.store = store
+        self.session_id = session_id
+        self.window = window
+        self.fold_batch = fold_batch
+        self.max_tokens = max_tokens
+        self.renderer = ContextBuilder()
+
+        # text: özet, folded_until: özete katılan son mesajın timestamp'i
+        saved = store.load_summary(session_id)
+        self.state = saved or {"text": "", "folded_until": "", "folded_turns": 0}
+        self._persisted = saved is not None
+        self.updates = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def summary(self) -> str:
+        return self.state.get("text", "")
+
+    def _unsummarized(self, history: List[Dict]) -> List[Dict]:
+        return [turn for turn in history if turn.get("timestamp", "") > self.folded_until]
+
+    @property
+    def folded_until(self) -> str:
+        return self.state.get("folded_until", "")
+
+    def trim(self, history: List[Dict], max_turns: int) -> List[Dict]:
+        """Geçmişi son max_turns mesaja indir - özete henüz katılmamış mesajlar (sınıra kadar) kalır"""
+        start = retained_start([turn.get("timestamp", "") for turn in history], max_turns,
+                               self.folded_until, self.store.max_pending_turns)
+        return history[start:]
+
+    def _save(self):
+        try:
+            self.store.save_summary(self.session_id, self.state)
+            self._persisted = True
+        except OSError as e:
+            print(f"⚠️ Özet kaydedilemedi: {e}")
+
+    def split(self, history: List[Dict]) -> Tuple[str, List[Dict]]:
+        """(özet, henüz özetlenmemiş mesajlar) - context builder'a bu ikisi verilir"""
+        return self.summary, self._unsummarized(history)
+
+    def pending(self, history: List[Dict]) -> List[Dict]:
+        """Pencereden çıkmış ama özete katılmamış mesajlar"""
+        unsummarized = self._unsummarized(history)
+        return unsummarized[:-self.window] if self.window else unsummarized
+
+    def update(self, history: List[Dict]) -> bool:
+        """Yeterli mesaj pencereden çıktıysa özeti güncelle - güncellendiyse True"""
+        with self._lock:
+            pending = self.pending(history)
+            if len(pending) < self.fold_batch:
+                return False
+
+            turns = "\n".join(
+                f"{'Kullanıcı' if turn['role'] == 'user' else 'Asistan'}: {self.renderer.render_turn(turn, verbatim=False)}"
+                for turn in pending if not is_error_turn(turn)
+            )
+            prompt = SUMMARY_PROMPT.format(summary=self.summary or "(yok)", turns=turns)
+
+            try:
+                response = self.client.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(temperature=0.1, max_output_tokens=self.max_tokens)
+                )
+                text = (response.text or "").strip()
+            except Exception as e:
+                text = ""
+                print(f"⚠️ Özet güncellenemedi: {e}")
+            if not text:
+                self.failures += 1
+                if not self._persisted:
+                    # Store sıkıştırması özete katılmamış mesajları korusun diye özet dosyası şimdiden yazılır
+                    self._save()
+                return False
+
+            self.state = {
+                "text": text,
+                "folded_until": pending[-1].get("timestamp", ""),
+                "folded_turns": self.state.get("folded_turns", 0) + len(pending),
+                "updated_at": datetime.now().isoformat()
+            }
+            self.updates += 1
+            self._save()
+            print(f"📝 Özet güncellendi: {len(pending)} mesaj katlandı (toplam {self.state['folded_turns']})")
+            return True
+
+    def update_async(self, history: List[Dict]):
+        """update()'i arka planda çalıştır - yanıt akışını bekletmez, aynı anda tek güncelleme"""
+        if len(self.pending(history)) < self.fold_batch:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.update, args=(list(history),), daemon=True,
+                                        name=f"summarizer-{self.session_id[:8]}")
+        self._thread.start()
+
+    def get_stats(self) -> Dict:
+        return {
+            "folded_turns": self.state.get("folded_turns", 0),
+            "summary_tokens": self.renderer.count_tokens(self.summary),
+            "window": self.window,
+            "updates": self.updates,
+            "failures": self.failures
+        }
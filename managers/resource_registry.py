@@ -0,0 +1,118 @@
+# resource_registry.py - Process genelinde paylaşılan ağır kaynaklar (model, index, corpus, client)
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Arka plan kurulumu başarısız olan RAG motoru en erken bu kadar saniye sonra yeniden kurulur
+RAG_SETUP_RETRY_SECONDS = float(os.getenv("RAG_SETUP_RETRY_SECONDS", "60"))
+
+
+class ResourceRegistry:
+    """
+    Streamlit her tarayıcı oturumu için script'i yeniden çalıştırır ama import edilen modüller
+    process içinde bir kez yüklenir. Bu registry modül seviyesinde yaşadığı için RAG motorları,
+    genai client ve ses konfigürasyonu tüm oturumlarda paylaşılır; oturumda sadece konuşma durumu kalır.
+    """
+
+    def __init__(self):
+        self._resources: Dict[Hashable, Any] = {}
+        self._created_at: Dict[Hashable, float] = {}
+        self._build_seconds: Dict[Hashable, float] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Kaynağı döndür, yoksa factory ile oluştur. Aynı anahtar için factory bir kez çalışır
+        (eşzamanlı oturumlar bekler); farklı anahtarlar birbirini bloklamaz.
+        factory None döndürürse saklanmaz - sonraki çağrı yeniden dener.
+        """
+        resource = self._resources.get(key)
+        if resource is not None:
+            self.hits += 1
+            return resource
+
+        with self._key_lock(key):
+            resource = self._resources.get(key)
+            if resource is not None:
+                self.hits += 1
+                return resource
+
+            started = time.perf_counter()
+            resource = factory()
+            if resource is not None:
+                self._resources[key] = resource
+                self._created_at[key] = time.time()
+                self._build_seconds[key] = time.perf_counter() - started
+            return resource
+
+    def get_rag_engine(self, key: Hashable, factory: Callable[[], Any],
+                       background: bool = False) -> Optional[Any]:
+        """
+        RAG motorunu oluştur ve kur. background=False: setup() beklenir, başarısızsa None (saklanmaz).
+        background=True: kurulum arka planda başlar, motor hemen döner - durum get_readiness() ile izlenir.
+        Arka plan kurulumu başarısız olduysa motor RAG_SETUP_RETRY_SECONDS sonra aynı nesne üzerinde yeniden
+        kurulur (registry'den atılmaz - federated retriever'lar aynı motoru tutuyor).
+        """
+        def build():
+            engine = factory()
+            if background:
+                engine.start_background_setup()
+                return engine
+            return engine if engine.setup() else None
+
+        engine = self.get_or_create(("rag", key), build)
+        failed_since = getattr(engine, "failed_since", None)
+        if background and failed_since is not None and time.time() - failed_since >= RAG_SETUP_RETRY_SECONDS:
+            print(f"🔁 Retrying RAG setup: {key}")
+            engine.start_background_setup()
+        return engine
+
+    def get_rag_readiness(self) -> Dict:
+        """Registry'deki RAG motorlarının kurulum durumu"""
+        return {
+            key[1]: resource.get_readiness()
+            for key, resource in list(self._resources.items())
+            if isinstance(key, tuple) and key[0] == "rag"
+        }
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        return self._resources.get(key)
+
+    def clear(self):
+        with self._lock:
+            self._resources.clear()
+            self._created_at.clear()
+            self._build_seconds.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            "resources": [str(key) for key in self._resources],
+            "build_seconds": {str(key): round(seconds, 2) for key, seconds in self._build_seconds.items()},
+            "hits": self.hits,
+            "rag": self.get_rag_readiness()
+        }
+
+
+# Singleton instance - bir kere oluştur, her yerden kullan
+_resource_registry_instance = None
+_resource_registry_lock = threading.Lock()
+
+def get_resource_registry() -> ResourceRegistry:
+    """ResourceRegistry singleton instance döndür"""
+    global _resource_registry_instance
+    if _resource_registry_instance is None:
+        with _resource_registry_lock:
+            if _resource_registry_instance is None:
+                _resource_registry_instance = ResourceRegistry()
+    return _resource_registry_instance
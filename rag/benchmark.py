@@ -0,0 +1,181 @@
+# rag/benchmark.py - Index tiplerini ve encoder backend'lerini baseline'a karşı kalite ve gecikme ile karşılaştır
+import argparse
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from rag.embedding_store import EmbeddingStore, normalize_rows
+from rag.index_builder import (DEFAULT_INDEX_PARAMS, INDEX_TYPES, build_id_index, id_to_row_map,
+                               index_memory_bytes, rerank_exact)
+from rag.snapshot import SnapshotStore
+
+
+def _percentile_ms(latencies: List[float], q: float) -> float:
+    return round(float(np.percentile(latencies, q)) * 1000, 3)
+
+
+def benchmark_index_backends(embeddings: np.ndarray,
+                             doc_hashes: List[str],
+                             queries: np.ndarray,
+                             k: int = 10,
+                             backends: Optional[List[str]] = None,
+                             index_params: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+    """
+    Her index tipini aynı corpus üzerinde kur ve normalize sorgu matrisiyle ölç.
+    recall@k flat (kesin) index sonuçlarına göre hesaplanır; gecikme tek sorgu başınadır ve
+    rerank_factor > 1 olan tiplerde kesin yeniden sıralamayı da içerir.
+    """
+    backends = backends or list(INDEX_TYPES)
+    index_params = index_params or {}
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    baseline = build_id_index(embeddings, doc_hashes, "flat")
+    k = min(k, baseline.ntotal)
+    _, truth = baseline.search(queries, k)
+    row_of = id_to_row_map(doc_hashes)
+    truth = np.vectorize(lambda i: row_of.get(int(i), -1), otypes=[np.int64])(truth)
+
+    report = []
+    for index_type in backends:
+        started = time.perf_counter()
+        index = build_id_index(embeddings, doc_hashes, index_type, index_params.get(index_type))
+        build_seconds = time.perf_counter() - started
+        params = {**DEFAULT_INDEX_PARAMS[index_type], **index_params.get(index_type, {})}
+        rerank_factor = int(params.get("rerank_factor", 1))
+        candidates = min(k * rerank_factor, index.ntotal)
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i in range(len(queries)):
+            started = time.perf_counter()
+            _, ids = index.search(queries[i:i + 1], candidates)
+            rows = np.array([[row_of.get(int(j), -1) for j in ids[0]]], dtype=np.int64)
+            if rerank_factor > 1:
+                _, rows = rerank_exact(embeddings, queries[i:i + 1], rows, k)
+            latencies.append(time.perf_counter() - started)
+            found[i] = rows[0][:k]
+
+        hits = sum(len(set(found[i]) & set(truth[i])) for i in range(len(queries)))
+        report.append({
+            "index_type": index_type,
+            f"recall@{k}": round(hits / truth.size, 4),
+            "p50_ms": _percentile_ms(latencies, 50),
+            "p99_ms": _percentile_ms(latencies, 99),
+            "build_s": round(build_seconds, 3),
+            "rerank_factor": rerank_factor,
+            "index_bytes": index_memory_bytes(index),
+            "vectors": index.ntotal
+        })
+    return report
+
+
+def _top_k_rows(embeddings: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    similarities = queries @ np.asarray(embeddings, dtype=np.float32).T
+    return np.argsort(-similarities, axis=1)[:, :k]
+
+
+def benchmark_encoder_backends(model_name: str,
+                               embeddings: np.ndarray,
+                               queries: List[str],
+                               k: int = 5,
+                               backends: Optional[List[str]] = None,
+                               repeats: int = 3) -> List[Dict]:
+    """
+    Sorgu encoder backend'lerini fp32 torch'a karşı ölç. Her backend için sorgu embedding'lerinin
+    fp32 ile cosine uyumu (ortalama/minimum), corpus üzerinde kesin top-k örtüşmesi ve
+    tek sorgu encode gecikmesi raporlanır. Yüklenemeyen backend atlanır.
+    """
+    from rag.encoder import ENCODER_BACKENDS, get_shared_encoder
+
+    backends = backends or list(ENCODER_BACKENDS)
+    k = min(k, len(embeddings))
+
+    reference = normalize_rows(get_shared_encoder(model_name, "torch").encode(queries, convert_to_numpy=True))
+    reference_rows = _top_k_rows(embeddings, reference, k)
+
+    report = []
+    for backend in backends:
+        try:
+            encoder = get_shared_encoder(model_name, backend, fallback=False)
+        except Exception as e:
+            print(f"⚠️ Skipping {backend}: {e}")
+            continue
+
+        encoder.encode(queries[:1], convert_to_numpy=True)  # Warm-up
+        latencies = []
+        for _ in range(repeats):
+            for query in queries:
+                started = time.perf_counter()
+                encoder.encode([query], convert_to_numpy=True)
+                latencies.append(time.perf_counter() - started)
+
+        vectors = normalize_rows(encoder.encode(queries, convert_to_numpy=True))
+        cosine = np.sum(vectors * reference, axis=1)
+        rows = _top_k_rows(embeddings, vectors, k)
+        overlap = np.mean([len(set(rows[i]) & set(reference_rows[i])) / k for i in range(len(queries))])
+
+        report.append({
+            "backend": backend,
+            "cosine_mean": round(float(cosine.mean()), 4),
+            "cosine_min": round(float(cosine.min()), 4),
+            f"overlap@{k}": round(float(overlap), 4),
+            "p50_ms": _percentile_ms(latencies, 50),
+            "p99_ms": _percentile_ms(latencies, 99)
+        })
+    return report
+
+
+def sample_queries(embeddings: np.ndarray, count: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Corpus vektörlerine gürültü ekleyerek sentetik sorgular üret (model yüklemeden benchmark için)"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), size=min(count, len(embeddings)), replace=False)
+    queries = np.asarray(embeddings[rows], dtype=np.float32)
+    queries = queries + rng.normal(scale=noise, size=queries.shape).astype(np.float32)
+    return normalize_rows(queries)
+
+
+def print_report(report: List[Dict]):
+    for row in report:
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index backend benchmark (recall@k vs flat, p50/p99)")
+    parser.add_argument("--cache-dir", default="./antep_rag_cache")
+    parser.add_argument("--prefix", default="antep_", help="Cache dosya ön eki (antep_, UNESCO için boş)")
+    parser.add_argument("--model", default="paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--encoders", nargs="+", default=None,
+                        help="Index yerine sorgu encoder backend'lerini ölç (torch, torch_int8, onnx, onnx_int8)")
+    args = parser.parse_args()
+
+    # Güncel snapshot'taki embedding'ler, snapshot yoksa eski düz cache dosyası
+    snapshot_dir = SnapshotStore(args.cache_dir, f"{args.prefix}snapshots").current_dir()
+    store = (EmbeddingStore(snapshot_dir, "embeddings") if snapshot_dir
+             else EmbeddingStore(args.cache_dir, f"{args.prefix}embeddings"))
+    loaded = store.load(args.model)
+    if loaded is None:
+        print("❌ Embedding store not found - run the RAG setup first")
+        return
+    embeddings, header = loaded
+
+    if args.encoders:
+        # Gaziantep test sorguları - fp32 parity ve gecikme
+        from gaziantep_rag import TEST_QUERIES
+
+        print(f"📊 Benchmarking encoders {args.encoders} on {len(TEST_QUERIES)} queries, k={args.k}")
+        print_report(benchmark_encoder_backends(args.model, embeddings, TEST_QUERIES, args.k, args.encoders))
+        return
+
+    print(f"📊 Benchmarking {args.backends} on {len(embeddings)} vectors, {args.queries} queries, k={args.k}")
+    report = benchmark_index_backends(
+        embeddings, header["doc_hashes"], sample_queries(embeddings, args.queries), args.k, args.backends
+    )
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# rag/bm25.py - Türkçe uyumlu inverted-index BM25 ve reciprocal rank fusion
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BM25_FORMAT_VERSION = 1
+
+# Türkçe büyük/küçük harf: İ -> i, I -> ı; ardından ı/i ve diğer Türkçe harfler ASCII'ye katlanır
+# ("İmam Çağdaş", "imam cagdas" ve "IMAM ÇAĞDAŞ" aynı token'lara düşer)
+_TURKISH_LOWER = str.maketrans({"İ": "i", "I": "ı"})
+# str.lower() "İ"yi "i" + birleşik nokta (U+0307) yapar - nokta atılır
+_TURKISH_FOLD = str.maketrans({"ı": "i", "ç": "c", "ğ": "g", "ö": "o", "ş": "s", "ü": "u",
+                               "â": "a", "î": "i", "û": "u", "\u0307": None})
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fold_turkish(text: str) -> str:
+    """Türkçe kurallarıyla küçük harfe çevir ve aksanları katla"""
+    return text.translate(_TURKISH_LOWER).lower().translate(_TURKISH_FOLD)
+
+
+def tokenize(text: str) -> List[str]:
+    """Katlanmış metni kelimelere ayır - tek karakterlik token'lar atlanır ("Çağdaş'ın" -> cagdas, in)"""
+    return [token for token in _TOKEN_RE.findall(fold_turkish(text)) if len(token) > 1]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Birden fazla sıralamayı RRF ile birleştir: score = sum(1 / (k + rank)) - (satır, skor) listesi döner"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index. Posting listeleri CSR düzeninde numpy dizileri olarak tutulur:
+    terim i için satırlar rows[indptr[i]:indptr[i+1]], terim frekansları tfs[...] içindedir.
+    Sorgu sadece sorgu terimlerinin posting listelerine dokunur.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.float32)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.content_hash = ""
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.doc_lengths)
+
+    def build(self, documents: List[str], content_hash: str = ""):
+        """Document metinlerinden index kur - satır numaraları corpus sırasıdır"""
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+
+        for row, document in enumerate(documents):
+            tokens = tokenize(document)
+            doc_lengths[row] = len(tokens)
+            for token in tokens:
+                term_postings = postings.setdefault(token, {})
+                term_postings[row] = term_postings.get(row, 0) + 1
+
+        terms = sorted(postings)
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        lengths = [len(postings[term]) for term in terms]
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.rows = np.fromiter((row for term in terms for row in postings[term]),
+                                dtype=np.int32, count=int(self.indptr[-1]))
+        self.tfs = np.fromiter((tf for term in terms for tf in postings[term].values()),
+                               dtype=np.float32, count=int(self.indptr[-1]))
+        self.doc_lengths = doc_lengths
+        self.content_hash = content_hash
+        self._compute_idf()
+
+    def _compute_idf(self):
+        doc_freq = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log(1.0 + (self.doc_count - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    def known_terms(self, query: str) -> Tuple[List[str], List[str]]:
+        """(index'te olan, olmayan) sorgu terimleri"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        known = [token for token in tokens if token in self.vocabulary]
+        return known, [token for token in tokens if token not in self.vocabulary]
+
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Tüm corpus için BM25 skorları ve her document'ın eşleşen terim sayısı"""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        matched = np.zeros(self.doc_count, dtype=np.int32)
+        if not self.doc_count:
+            return scores, matched
+
+        avg_length = float(self.doc_lengths.mean()) or 1.0
+        known, _ = self.known_terms(query)
+        for term in known:
+            term_id = self.vocabulary[term]
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            rows = self.rows[start:end]
+            tf = self.tfs[start:end]
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[rows] / avg_length)
+            scores[rows] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + norm)
+            matched[rows] += 1
+        return scores, matched
+
+    def search(self, query: str, top_k: int = 15,
+               allowed_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """En yüksek skorlu top_k (skorlar, satırlar) - sadece skoru > 0 olanlar; allowed_rows ile sınırlanabilir"""
+        scores, _ = self.score(query)
+        if allowed_rows is not None:
+            mask = np.zeros(self.doc_count, dtype=bool)
+            mask[allowed_rows] = True
+            scores = np.where(mask, scores, 0.0)
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return scores[order], order
+
+    def save(self, path: str):
+        """Index'i pickle'sız .npz olarak atomik yaz"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(BM25_FORMAT_VERSION),
+                params=np.array([self.k1, self.b], dtype=np.float32),
+                content_hash=np.array(self.content_hash),
+                terms=np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=str),
+                indptr=self.indptr,
+                rows=self.rows,
+                tfs=self.tfs,
+                doc_lengths=self.doc_lengths
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, content_hash: str) -> Optional["BM25Index"]:
+        """Kayıtlı index'i yükle - corpus değiştiyse ya da dosya bozuksa None döner"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != BM25_FORMAT_VERSION or str(data["content_hash"]) != content_hash:
+                    return None
+                k1, b = (float(v) for v in data["params"])
+                index = cls(k1=k1, b=b)
+                index.vocabulary = {term: i for i, term in enumerate(data["terms"].tolist())}
+                index.indptr = data["indptr"]
+                index.rows = data["rows"]
+                index.tfs = data["tfs"]
+                index.doc_lengths = data["doc_lengths"]
+                index.content_hash = content_hash
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ BM25 index load failed: {e}")
+            return None
+        index._compute_idf()
+        return index
+
+    def get_stats(self) -> Dict:
+        return {
+            "documents": self.doc_count,
+            "terms": len(self.vocabulary),
+            "postings": int(self.indptr[-1])
+        }
@@ -0,0 +1,101 @@
+# rag/build.py - Offline cache snapshot build (CI/cron) - serving host'ta encode gerekmez
+import argparse
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from rag.encoder import get_shared_encoder
+from rag.engine import RAGEngine
+from rag.index_builder import INDEX_TYPES
+
+
+def corpus_factories() -> Dict[str, Callable[..., RAGEngine]]:
+    """Build edilebilir corpus'lar - uygulama modülleri sadece build sırasında import edilir"""
+    from gaziantep_rag import GaziantepRAGSystem
+    from simple_rag import SimpleRAGSystem
+
+    return {"gaziantep": GaziantepRAGSystem, "unesco": SimpleRAGSystem}
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:.0f} docs/s" if seconds > 0 and count else "-"
+
+
+def build_corpus(engine: RAGEngine, batch_size: int = 32, prepare_workers: int = 1,
+                 encode_workers: int = 1) -> Optional[Dict]:
+    """
+    Engine'in snapshot'ını kur ve throughput raporu döndür (başarısızsa None).
+    encode_workers > 1 ise document'lar SentenceTransformer multi-process pool'unda encode edilir.
+    """
+    engine.encode_batch_size = batch_size
+    engine.prepare_workers = prepare_workers
+
+    pool = None
+    if encode_workers > 1:
+        encoder = get_shared_encoder(engine.model_name, "torch")
+        pool = encoder.start_multi_process_pool(target_devices=["cpu"] * encode_workers)
+        engine.encode_pool = pool
+
+    started = time.perf_counter()
+    try:
+        if not engine.build_snapshot():
+            return None
+    finally:
+        if pool is not None:
+            get_shared_encoder(engine.model_name, "torch").stop_multi_process_pool(pool)
+            engine.encode_pool = None
+    total_seconds = time.perf_counter() - started
+
+    stats = engine.build_stats
+    return {
+        "corpus": engine.name,
+        "documents": len(engine.items),
+        "snapshot": engine.snapshots.current_dir(),
+        "prepare": f"{stats['prepared']} in {stats['prepare_s']:.2f}s ({_rate(stats['prepared'], stats['prepare_s'])})",
+        "encode": f"{stats['encoded']} in {stats['encode_s']:.2f}s ({_rate(stats['encoded'], stats['encode_s'])})",
+        "total": f"{total_seconds:.2f}s ({_rate(len(engine.items), total_seconds)})"
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="RAG cache snapshot build (document hazırlama + encode + index)")
+    parser.add_argument("--corpus", nargs="+", default=["gaziantep", "unesco"], choices=["gaziantep", "unesco"])
+    parser.add_argument("--data-path", help="Veri dosyası (tek corpus için)")
+    parser.add_argument("--cache-dir", help="Snapshot'ın yazılacağı cache dizini (tek corpus için)")
+    parser.add_argument("--model", help="Embedding modeli (varsayılan: corpus ayarı)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, help="FAISS index tipi (varsayılan: RAG_INDEX_TYPE / flat)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--prepare-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--encode-workers", type=int, default=1,
+                        help="Encode için CPU worker process sayısı (1: tek process)")
+    args = parser.parse_args(argv)
+
+    if (args.data_path or args.cache_dir) and len(args.corpus) > 1:
+        parser.error("--data-path/--cache-dir require a single --corpus")
+
+    overrides = {key: value for key, value in {
+        "data_path": args.data_path,
+        "cache_dir": args.cache_dir,
+        "model_name": args.model,
+        "index_type": args.index_type,
+    }.items() if value}
+
+    factories = corpus_factories()
+    failed = False
+    for name in args.corpus:
+        print(f"🏗️ Building {name} snapshot...")
+        report = build_corpus(factories[name](**overrides), args.batch_size,
+                              args.prepare_workers, args.encode_workers)
+        if report is None:
+            print(f"❌ {name} build failed")
+            failed = True
+            continue
+        print(f"📈 {report['corpus']}: {report['documents']} documents -> {report['snapshot']}")
+        print(f"   prepare {report['prepare']} | encode {report['encode']} | total {report['total']}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
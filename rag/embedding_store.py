@@ -0,0 +1,200 @@
+# rag/embedding_store.py - Pickle'sız, memory-mapped embedding deposu
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+STORE_FORMAT_VERSION = 2
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Satırları L2 normalize et (cosine similarity için) - kopya döndürür"""
+    embeddings = np.array(embeddings, dtype=np.float32, copy=True)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def document_hash(document: str) -> str:
+    """Tek bir document text'inin hash'i - değişiklik tespiti ve stabil ID için"""
+    return hashlib.sha1(document.encode("utf-8")).hexdigest()
+
+
+def document_id(doc_hash: str) -> int:
+    """Document hash'inden FAISS için pozitif int64 ID türet (60 bit)"""
+    return int(doc_hash[:15], 16)
+
+
+def compute_content_hash(doc_hashes: List[str]) -> str:
+    """Document hash'lerinin toplam hash'i - corpus değişti mi kontrolü için"""
+    digest = hashlib.sha256()
+    for doc_hash in doc_hashes:
+        digest.update(doc_hash.encode("ascii"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Embedding matrisini ham float32 .npy olarak saklar, yanında küçük bir JSON header tutar
+    (model adı, boyut, adet, içerik hash'i, satır başına document hash'leri).
+    Yükleme np.load(mmap_mode='r') ile yapılır: veri heap'e kopyalanmaz, aynı dosyayı açan
+    tüm worker process'ler OS page cache'teki sayfaları paylaşır.
+    """
+
+    def __init__(self, cache_dir: str, name: str):
+        self.matrix_file = os.path.join(cache_dir, f"{name}.npy")
+        self.header_file = os.path.join(cache_dir, f"{name}.json")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.matrix_file) and os.path.exists(self.header_file)
+
+    def read_header(self) -> Optional[Dict]:
+        try:
+            with open(self.header_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def load(self, model_name: str) -> Optional[Tuple[np.ndarray, Dict]]:
+        """Header geçerli ve model eşleşiyorsa (memmap'li read-only matris, header) döndür"""
+        if not self.exists():
+            return None
+
+        header = self.read_header()
+        if not header or header.get("version") != STORE_FORMAT_VERSION:
+            print("⚠️ Embedding store header invalid")
+            return None
+        if header.get("model_name") != model_name:
+            print(f"⚠️ Embedding store model mismatch: {header.get('model_name')} != {model_name}")
+            return None
+
+        embeddings = np.load(self.matrix_file, mmap_mode="r")
+        if embeddings.dtype != np.float32 or embeddings.shape != (header["count"], header["dim"]):
+            print("⚠️ Embedding store shape mismatch")
+            return None
+        if len(header.get("doc_hashes", [])) != header["count"]:
+            print("⚠️ Embedding store doc hash count mismatch")
+            return None
+
+        return embeddings, header
+
+    def save(self, embeddings: np.ndarray, model_name: str, doc_hashes: List[str]) -> np.ndarray:
+        """
+        Matrisi normalize edip header ile birlikte atomik olarak yaz (önce matris, header en son = commit).
+        Kaydedilen dosyanın memmap'ini döndürür.
+        """
+        embeddings = np.ascontiguousarray(normalize_rows(embeddings), dtype=np.float32)
+
+        # Eski header'ı önce kaldır - yazım yarıda kalırsa eşleşmeyen matris okunmasın
+        if os.path.exists(self.header_file):
+            os.remove(self.header_file)
+
+        tmp_matrix = self.matrix_file + ".tmp"
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, embeddings)
+        os.replace(tmp_matrix, self.matrix_file)
+
+        header = {
+            "version": STORE_FORMAT_VERSION,
+            "model_name": model_name,
+            "dim": int(embeddings.shape[1]),
+            "count": int(embeddings.shape[0]),
+            "dtype": "float32",
+            "normalized": True,
+            "content_hash": compute_content_hash(doc_hashes),
+            "doc_hashes": list(doc_hashes)
+        }
+        tmp_header = self.header_file + ".tmp"
+        with open(tmp_header, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp_header, self.header_file)
+
+        return np.load(self.matrix_file, mmap_mode="r")
+
+
+def sync_embeddings(store: EmbeddingStore,
+                    documents: List[str],
+                    model_name: str,
+                    encode_fn: Callable[[List[str]], np.ndarray],
+                    target: Optional[EmbeddingStore] = None) -> Dict:
+    """
+    Store'u güncel document listesiyle senkronize et.
+    Sadece yeni/değişen document'lar encode edilir; değişmeyenlerin vektörleri store'dan alınır.
+    target verilirse güncel matris oraya yazılır (kaynak store değişmez - örn. yeni snapshot).
+
+    Dönen dict:
+        embeddings   - corpus sırasında memmap'li matris
+        doc_hashes   - satır başına document hash'leri
+        added        - index'e eklenecek yeni hash'ler
+        removed      - index'ten silinecek eski hash'ler
+        full_rebuild - index baştan kurulmalı mı (ID'li önceki durum yok)
+        encoded      - encode edilen document sayısı
+        saved        - matris yeniden yazıldı mı (False: kaynak store zaten güncel)
+    """
+    doc_hashes = [document_hash(doc) for doc in documents]
+    content_hash = compute_content_hash(doc_hashes)
+
+    old_embeddings = None
+    old_rows: Dict[str, int] = {}
+    full_rebuild = True
+
+    loaded = store.load(model_name)
+    if loaded is not None:
+        old_embeddings, header = loaded
+        if header["content_hash"] == content_hash:
+            print(f"✅ Loaded {len(old_embeddings)} cached embeddings (mmap)")
+            return {
+                "embeddings": old_embeddings,
+                "doc_hashes": doc_hashes,
+                "added": [],
+                "removed": [],
+                "full_rebuild": False,
+                "encoded": 0,
+                "saved": False
+            }
+        old_rows = {h: i for i, h in enumerate(header["doc_hashes"])}
+        full_rebuild = False
+
+    # Aynı içerikli document'lar bir kez encode edilir
+    missing: Dict[str, int] = {}
+    for i, h in enumerate(doc_hashes):
+        if h not in old_rows and h not in missing:
+            missing[h] = i
+
+    new_vectors = None
+    if missing:
+        print(f"🧠 Encoding {len(missing)}/{len(documents)} new or changed documents...")
+        new_vectors = normalize_rows(encode_fn([documents[i] for i in missing.values()]))
+        new_rows = {h: j for j, h in enumerate(missing)}
+
+    if new_vectors is not None:
+        dim = new_vectors.shape[1]
+    elif old_embeddings is not None:
+        dim = old_embeddings.shape[1]
+    else:
+        # Boş corpus ve önceki store yok - boyut için tek bir boş metin encode edilir
+        dim = np.asarray(encode_fn([""])).shape[1]
+
+    matrix = np.empty((len(documents), dim), dtype=np.float32)
+    for i, h in enumerate(doc_hashes):
+        if h in old_rows:
+            matrix[i] = old_embeddings[old_rows[h]]
+        else:
+            matrix[i] = new_vectors[new_rows[h]]
+
+    embeddings = (target or store).save(matrix, model_name, doc_hashes)
+
+    old_hashes = set(old_rows)
+    new_hashes = set(doc_hashes)
+    return {
+        "embeddings": embeddings,
+        "doc_hashes": doc_hashes,
+        "added": sorted(new_hashes - old_hashes),
+        "removed": sorted(old_hashes - new_hashes),
+        "full_rebuild": full_rebuild,
+        "encoded": len(missing),
+        "saved": True
+    }
@@ -0,0 +1,99 @@
+# rag/encoder.py - Process genelinde paylaşılan embedding modeli
+import glob
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from sentence_transformers import SentenceTransformer
+
+# torch: fp32 PyTorch (varsayılan)
+# torch_int8: Linear katmanları dinamik int8 quantize edilmiş PyTorch (ek bağımlılık yok)
+# onnx: fp32 ONNX Runtime
+# onnx_int8: dinamik int8 quantize ONNX modeli (ilk kullanımda export edilir)
+# onnx backend'leri sentence-transformers>=3.2 ve optimum[onnxruntime] ister
+ENCODER_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+# Quantize ONNX export'larının yazıldığı dizin ve hedef CPU komut seti (avx2, avx512, avx512_vnni, arm64)
+ONNX_EXPORT_DIR = os.getenv("RAG_ONNX_DIR", "./rag_models")
+ONNX_QUANTIZATION = os.getenv("RAG_ONNX_QUANTIZATION", "avx2")
+
+_encoders: Dict[Tuple[str, str], SentenceTransformer] = {}
+_lock = threading.Lock()
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Backend adını doğrula - verilmezse RAG_ENCODER_BACKEND, o da yoksa torch"""
+    backend = (backend or os.getenv("RAG_ENCODER_BACKEND", "torch")).lower()
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend} (expected one of {ENCODER_BACKENDS})")
+    return backend
+
+
+def _find_quantized_file(export_dir: str, quantization: str) -> Optional[str]:
+    matches = sorted(glob.glob(os.path.join(export_dir, "onnx", f"model_*{quantization}.onnx")))
+    return os.path.relpath(matches[0], export_dir) if matches else None
+
+
+def _load_quantized_onnx(model_name: str) -> SentenceTransformer:
+    """int8 ONNX modelini yükle - yerel export yoksa bir kez oluştur"""
+    export_dir = os.path.join(ONNX_EXPORT_DIR, model_name.replace("/", "__"))
+    file_name = _find_quantized_file(export_dir, ONNX_QUANTIZATION)
+
+    if file_name is None:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        print(f"🔧 Exporting int8 ONNX model ({ONNX_QUANTIZATION}) to {export_dir}")
+        onnx_model = SentenceTransformer(model_name, backend="onnx")
+        onnx_model.save_pretrained(export_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION, export_dir)
+        file_name = _find_quantized_file(export_dir, ONNX_QUANTIZATION)
+
+    return SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def _load_encoder(model_name: str, backend: str) -> SentenceTransformer:
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx")
+    if backend == "onnx_int8":
+        return _load_quantized_onnx(model_name)
+
+    encoder = SentenceTransformer(model_name)
+    if backend == "torch_int8":
+        import torch
+
+        # Dinamik quantization sadece CPU'da çalışır
+        encoder = torch.quantization.quantize_dynamic(encoder.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8)
+    return encoder
+
+
+def get_shared_encoder(model_name: str, backend: Optional[str] = None,
+                       fallback: bool = True) -> SentenceTransformer:
+    """
+    Model adı ve backend başına tek SentenceTransformer örneği döndür - aynı process'te birden fazla
+    corpus sunulsa da model belleğe bir kez yüklenir.
+    fallback=True iken hızlandırılmış backend yüklenemezse (eksik bağımlılık vb.) fp32 torch kullanılır.
+    """
+    backend = resolve_backend(backend)
+    with _lock:
+        encoder = _encoders.get((model_name, backend))
+        if encoder is None:
+            print(f"🧠 Loading embedding model: {model_name} ({backend})")
+            try:
+                encoder = _load_encoder(model_name, backend)
+            except Exception as e:
+                if backend == "torch" or not fallback:
+                    raise
+                print(f"⚠️ {backend} encoder unavailable ({e}), falling back to torch")
+                encoder = _encoders.get((model_name, "torch")) or _load_encoder(model_name, "torch")
+                _encoders[(model_name, "torch")] = encoder
+            _encoders[(model_name, backend)] = encoder
+        return encoder
+
+
+def loaded_encoders() -> Dict[str, int]:
+    """Yüklü modeller ve embedding boyutları"""
+    with _lock:
+        return {
+            f"{name}@{backend}": encoder.get_sentence_embedding_dimension()
+            for (name, backend), encoder in _encoders.items()
+        }
@@ -0,0 +1,941 @@
+# rag/engine.py - Corpus'tan bağımsız retrieval motoru (FAISS + BM25 + Sentence Transformers)
+import json
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from rag.benchmark import benchmark_encoder_backends, benchmark_index_backends, print_report
+from rag.bm25 import BM25Index, reciprocal_rank_fusion
+from rag.embedding_store import EmbeddingStore, compute_content_hash, sync_embeddings
+from rag.encoder import get_shared_encoder, resolve_backend
+from rag.index_builder import (DEFAULT_INDEX_PARAMS, build_id_index, build_partitions,
+                               id_to_row_map, index_memory_bytes, load_index, patch_id_index,
+                               rerank_exact, save_index, search_partition)
+from rag.query_cache import QueryEmbeddingCache
+from rag.snapshot import COMPONENT_FILES, SnapshotStore, source_fingerprint
+
+SEARCH_MODES = ("auto", "hybrid", "dense", "sparse")
+KEYWORD_QUERY_MAX_TERMS = 3  # auto modda bu kadar terime kadar olan sorgular sparse aranabilir
+
+# Kurulum aşamaları - index ve corpus önce, encoder en son yüklenir; BM25 hazır olunca
+# encoder beklenmeden sparse arama yapılabilir. Değişen bileşenler "snapshot" aşamasında yayınlanır
+SETUP_STAGES = ("data", "embeddings", "index", "partitions", "bm25", "snapshot", "encoder")
+
+DocumentBuilder = Callable[[Dict], str]
+ResultFormatter = Callable[[List[Dict], int], str]
+
+
+class RAGEngine:
+    """
+    Genel RAG motoru. Corpus'a özgü kısımlar parametre olarak verilir:
+        collection_key   - JSON'daki kayıt listesinin anahtarı ("places", "sites")
+        result_key       - sonuç dict'inde kaydın anahtarı ("place", "site")
+        file_prefix      - cache dosya adı ön eki ("antep_" -> antep_faiss.index)
+        document_builder - kayıt -> embedding/BM25 için document text
+        formatter        - (sonuçlar, max_context) -> Gemini context metni
+    Embedding modeli process genelinde paylaşılır (rag.encoder.get_shared_encoder).
+    """
+
+    DEFAULT_TOP_K = 15
+
+    def __init__(self,
+                 name: str,
+                 data_path: str,
+                 model_name: str,
+                 cache_dir: str,
+                 collection_key: str,
+                 result_key: str,
+                 document_builder: DocumentBuilder,
+                 formatter: ResultFormatter,
+                 file_prefix: str = "",
+                 category_key: str = "category",
+                 query_cache_size: int = 1024,
+                 persist_query_cache: bool = False,
+                 index_type: Optional[str] = None,
+                 index_params: Optional[Dict] = None,
+                 search_mode: str = "auto",
+                 rrf_k: int = 60,
+                 encoder_backend: Optional[str] = None):
+
+        self.name = name
+        self.data_path = data_path
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.collection_key = collection_key
+        self.result_key = result_key
+        self.category_key = category_key
+        self.document_builder = document_builder
+        self.formatter = formatter
+
+        # FAISS index tipi: flat (kesin), hnsw, ivf_flat, ivf_pq - RAG_INDEX_TYPE ile de seçilebilir
+        self.index_type = (index_type or os.getenv("RAG_INDEX_TYPE", "flat")).lower()
+        self.index_params = index_params or {}
+        if self.index_type not in DEFAULT_INDEX_PARAMS:
+            raise ValueError(f"Unknown index type: {self.index_type} (expected one of {tuple(DEFAULT_INDEX_PARAMS)})")
+
+        # Sıkıştırılmış index'lerde (sq8, sq_fp16, ivf_pq) adaylar float32 embedding'lerle kesin yeniden sıralanır
+        self.rerank_factor = int({**DEFAULT_INDEX_PARAMS[self.index_type], **self.index_params}.get("rerank_factor", 1))
+
+        # Sorgu encoder backend'i: torch (fp32), torch_int8, onnx, onnx_int8 - RAG_ENCODER_BACKEND ile de seçilebilir.
+        # Document embedding'leri her zaman fp32 torch ile üretilir (embedding store model adına bağlı)
+        self.encoder_backend = resolve_backend(encoder_backend)
+
+        # Arama modu: dense (FAISS), sparse (BM25), hybrid (RRF ile birleşik),
+        # auto (anahtar kelime sorgularında sparse, diğerlerinde hybrid)
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {search_mode} (expected one of {SEARCH_MODES})")
+        self.search_mode = search_mode
+        self.rrf_k = rrf_k
+
+        # Core components
+        self.model = None
+        self.items: List[Dict] = []
+        self.metadata: Dict = {}
+        self.embeddings = None
+        self.doc_hashes = []      # Satır başına document hash'leri
+        self._id_to_row = {}      # FAISS ID -> satır
+        self._index_patch = None  # Index'e uygulanacak ekle/çıkar farkı
+        self.index = None
+        self.category_partitions = {}  # Kategori -> Partition (ana index filtresi, corpus satırları)
+        self.bm25 = None
+
+        # Kurulum durumu (get_readiness)
+        self._setup_stage = None
+        self._completed_stages: List[str] = []
+        self._setup_error = None
+        self._setup_started = None
+        self._setup_finished = None
+        self._setup_thread = None
+        self._setup_lock = threading.Lock()
+        self._setup_done = threading.Event()
+
+        # Cache snapshot'ı - items, embeddings, FAISS index ve BM25 tek versiyonlu dizinde, manifest'li
+        self.snapshots = SnapshotStore(cache_dir, f"{file_prefix}snapshots")
+        self.content_hash = ""
+        self._manifest = None        # Mevcut snapshot'ın manifest'i
+        self._snapshot_dir = None    # Mevcut snapshot dizini
+        self._staging_dir = None     # Yeniden kurulan bileşenlerin yazıldığı yeni snapshot
+        self._reused_files: Dict[str, str] = {}  # Yeni snapshot'a link'lenecek değişmeyen dosyalar
+        self._fresh: Dict[str, bool] = {}        # Bileşen manifest'e göre güncel mi
+        self._source = None          # Kaynak veri dosyasının parmak izi
+
+        # Document hazırlama/encode ayarları - offline build (rag.build) paralel worker ve pool verir
+        self.encode_batch_size = int(os.getenv("RAG_ENCODE_BATCH_SIZE", "32"))
+        self.prepare_workers = 1
+        self.encode_pool = None       # SentenceTransformer multi-process pool
+        self.build_stats = {"prepared": 0, "prepare_s": 0.0, "encoded": 0, "encode_s": 0.0}
+        self._documents = None        # Kurulum boyunca hazırlanmış document'lar (embeddings + BM25)
+
+        # Snapshot öncesi düz cache dosyaları - ilk snapshot bunlardan (yeniden encode etmeden) taşınır
+        self.legacy_embedding_store = EmbeddingStore(cache_dir, f"{file_prefix}embeddings")
+        self.legacy_index_file = os.path.join(cache_dir, f"{file_prefix}faiss.index")
+        self.legacy_bm25_file = os.path.join(cache_dir, f"{file_prefix}bm25.npz")
+
+        # Create cache directory
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Tekrarlanan sorgular için encode cache'i
+        self.query_cache = QueryEmbeddingCache(
+            model_name if self.encoder_backend == "torch" else f"{model_name}@{self.encoder_backend}",
+            max_entries=query_cache_size,
+            disk_path=os.path.join(cache_dir, f"{file_prefix}query_cache") if persist_query_cache else None
+        )
+
+        print(f"🤖 {name} System initialized")
+        print(f"📁 Data: {data_path}")
+        print(f"🧠 Model: {model_name}")
+        print(f"💾 Cache: {cache_dir}")
+
+    def setup(self) -> bool:
+        """RAG sistemini kur (senkron) - aşamalar SETUP_STAGES sırasıyla çalışır"""
+        return self._run_setup()
+
+    def build_snapshot(self) -> bool:
+        """Sadece cache snapshot'ını kur/güncelle - sorgu encoder'ı yüklenmez (offline build için)"""
+        return self._run_setup(SETUP_STAGES[:SETUP_STAGES.index("snapshot") + 1])
+
+    def start_background_setup(self) -> threading.Thread:
+        """
+        Kurulumu arka plan thread'inde başlat ve hemen dön. İlerleme get_readiness() ile izlenir;
+        BM25 hazır olduğunda sorgular sparse modda, encoder yüklenince tam modda cevaplanır.
+        Önceki kurulum başarısız bittiyse yeniden dener; çalışan ya da başarılı kurulum tekrar başlatılmaz.
+        """
+        with self._setup_lock:
+            if self._setup_thread is None or self.failed_since is not None:
+                # Durum thread başlamadan sıfırlanır - eşzamanlı çağrılar ikinci bir thread başlatmaz
+                self._reset_setup_state()
+                self._setup_thread = threading.Thread(target=self._run_setup, kwargs={"reset": False},
+                                                      name=f"{self.name} setup", daemon=True)
+                self._setup_thread.start()
+            return self._setup_thread
+
+    def _reset_setup_state(self):
+        """Önceki kurulumun ilerlemesini ve hatasını temizle - her kurulum sıfırdan raporlanır"""
+        self._completed_stages = []
+        self._setup_error = None
+        self._setup_finished = None
+        self._setup_started = time.time()
+        self._setup_done.clear()
+
+    @property
+    def failed_since(self) -> Optional[float]:
+        """Son kurulum başarısız bittiyse bitiş zamanı, değilse None"""
+        if self._setup_done.is_set() and self._setup_error is not None:
+            return self._setup_finished
+        return None
+
+    def _run_setup(self, stages: Tuple[str, ...] = SETUP_STAGES, reset: bool = True) -> bool:
+        if reset:
+            # Arka plan kurulumu (reset=False) durumu thread'i başlatmadan önce sıfırlar
+            self._reset_setup_state()
+        steps = {
+            # 1. Load data
+            "data": self._load_data,
+            # 2. Load or create embeddings (encoder sadece encode edilecek document varsa yüklenir)
+            "embeddings": self._load_or_create_embeddings,
+            # 3. Setup FAISS index
+            "index": self._setup_faiss_index,
+            # 4. Kategori alt-index'leri (filtreli arama için)
+            "partitions": self._build_category_partitions,
+            # 5. BM25 sparse index (tam terim eşleşmeleri için)
+            "bm25": self._setup_bm25_index,
+            # 6. Değişen bileşenleri yeni snapshot olarak yayınla
+            "snapshot": self._publish_snapshot,
+            # 7. Load model (process genelinde paylaşılan örnek)
+            "encoder": self._load_encoder
+        }
+        self._fresh = {}
+        self._reused_files = {}
+        self.build_stats = {"prepared": 0, "prepare_s": 0.0, "encoded": 0, "encode_s": 0.0}
+
+        try:
+            for stage in stages:
+                self._setup_stage = stage
+                if steps[stage]() is False:
+                    self._setup_error = f"{stage} stage failed"
+                    return False
+                self._completed_stages.append(stage)
+
+            print(f"✅ {self.name} {'system ready' if stages == SETUP_STAGES else 'snapshot built'}! "
+                  f"({time.time() - self._setup_started:.1f}s)")
+            return True
+
+        except Exception as e:
+            print(f"❌ Setup error: {e}")
+            self._setup_error = str(e)
+            return False
+
+        finally:
+            self._documents = None
+            # Yarıda kalan kurulumun staging dizini yayınlanmaz
+            if self._staging_dir is not None:
+                self.snapshots.discard(self._staging_dir)
+                self._staging_dir = None
+            self._setup_stage = None
+            self._setup_finished = time.time()
+            self._setup_done.set()
+
+    def _load_encoder(self) -> bool:
+        if self.model is None:
+            self.model = get_shared_encoder(self.model_name, self.encoder_backend)
+        print(f"✅ Model loaded: {self.model.get_sentence_embedding_dimension()} dim")
+        return True
+
+    @property
+    def encoder_ready(self) -> bool:
+        return self.model is not None
+
+    def is_searchable(self) -> bool:
+        """Sorgu cevaplanabilir mi - BM25 hazırsa encoder beklenmez"""
+        return self.bm25 is not None or (self.model is not None and self.index is not None)
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Kurulum bitene kadar bekle - tüm aşamalar başarılıysa True"""
+        self._setup_done.wait(timeout)
+        return len(self._completed_stages) == len(SETUP_STAGES)
+
+    def get_readiness(self) -> Dict:
+        """Kurulum ilerlemesi - uygulamalar ve /health için"""
+        completed = list(self._completed_stages)
+        end = self._setup_finished or time.time()
+        return {
+            "name": self.name,
+            "stage": self._setup_stage,
+            "completed_stages": completed,
+            "progress": round(len(completed) / len(SETUP_STAGES), 2),
+            "ready": len(completed) == len(SETUP_STAGES),
+            "searchable": self.is_searchable(),
+            "encoder_ready": self.encoder_ready,
+            "error": self._setup_error,
+            "elapsed_s": round(end - self._setup_started, 2) if self._setup_started else None
+        }
+
+    def _snapshot_file(self, file_name: str) -> Optional[str]:
+        """Mevcut snapshot'taki bileşen dosyası (yoksa None)"""
+        if self._snapshot_dir is None:
+            return None
+        path = os.path.join(self._snapshot_dir, file_name)
+        return path if os.path.exists(path) else None
+
+    def _staged_file(self, file_name: str) -> str:
+        """Yeniden kurulan bileşen dosyasının yeni snapshot'taki yolu - staging dizini ilk ihtiyaçta açılır"""
+        if self._staging_dir is None:
+            self._staging_dir = self.snapshots.begin()
+        self._reused_files.pop(file_name, None)
+        return os.path.join(self._staging_dir, file_name)
+
+    def _component_fresh(self, component: str, **expected) -> bool:
+        """Manifest'teki bileşen kaydı beklenen değerlerle eşleşiyor mu - dosyalar okunmadan O(1)"""
+        record = (self._manifest or {}).get("components", {}).get(component)
+        return record is not None and all(record.get(key) == value for key, value in expected.items())
+
+    def _load_data(self) -> bool:
+        try:
+            self._manifest = self.snapshots.read_manifest()
+            self._snapshot_dir = self.snapshots.current_dir() if self._manifest else None
+            self._source = source_fingerprint(self.data_path)
+
+            # Kaynak dosya snapshot'tan beri değişmediyse kayıtlar snapshot'tan okunur
+            items_file = self._snapshot_file("items.pkl")
+            if items_file and self._component_fresh("items", source=self._source):
+                try:
+                    with open(items_file, 'rb') as f:
+                        cached = pickle.load(f)
+                    self.items, self.metadata = cached["items"], cached["metadata"]
+                    self._fresh["items"] = True
+                    self._reused_files["items.pkl"] = items_file
+                    print(f"✅ Loaded {len(self.items)} {self.collection_key} (snapshot {self._manifest['snapshot']})")
+                except Exception as e:
+                    print(f"⚠️ Snapshot items unreadable ({e}), reloading source data...")
+
+            if not self._fresh.get("items"):
+                print(f"📖 Loading {self.name} data...")
+
+                with open(self.data_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+
+                self.items = data.get(self.collection_key, [])
+                self.metadata = data.get('metadata', {})
+
+                print(f"✅ Loaded {len(self.items)} {self.collection_key}")
+
+                # Cache items (yeni snapshot'a)
+                with open(self._staged_file("items.pkl"), 'wb') as f:
+                    pickle.dump({"items": self.items, "metadata": self.metadata}, f)
+
+            # Kategorileri göster
+            if self.category_key:
+                print(f"📊 Categories: {self._category_counts()}")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Data loading error: {e}")
+            return False
+
+    def _category_counts(self) -> Dict[str, int]:
+        categories = {}
+        for item in self.items:
+            category = item.get(self.category_key, 'unknown')
+            categories[category] = categories.get(category, 0) + 1
+        return categories
+
+    def _load_or_create_embeddings(self) -> bool:
+        """Embeddings'i snapshot'tan yükle - sadece yeni/değişen kayıtlar encode edilir"""
+
+        try:
+            # Kayıtlar ve model manifest'le eşleşiyorsa document hazırlama ve hash'leme atlanır
+            if self._fresh.get("items") and self._component_fresh("embeddings", model_name=self.model_name):
+                store = EmbeddingStore(self._snapshot_dir, "embeddings")
+                loaded = store.load(self.model_name)
+                if loaded is not None:
+                    embeddings, header = loaded
+                    if header["content_hash"] == self._manifest["content_hash"] and header["count"] == len(self.items):
+                        self._use_embeddings(embeddings, header["doc_hashes"], header["content_hash"])
+                        self._index_patch = {"full_rebuild": False, "added": [], "removed": []}
+                        self._fresh["embeddings"] = True
+                        self._reused_files["embeddings.npy"] = store.matrix_file
+                        self._reused_files["embeddings.json"] = store.header_file
+                        print(f"✅ Loaded {len(embeddings)} cached embeddings (mmap)")
+                        return True
+                print("⚠️ Snapshot embeddings do not match manifest, resyncing...")
+
+            documents = self._prepare_documents()
+
+            # Önceki vektörler mevcut snapshot'tan, o yoksa snapshot öncesi düz cache'ten alınır
+            source = (EmbeddingStore(self._snapshot_dir, "embeddings") if self._snapshot_file("embeddings.json")
+                      else self.legacy_embedding_store)
+            target = EmbeddingStore(os.path.dirname(self._staged_file("embeddings.npy")), "embeddings")
+
+            sync = sync_embeddings(
+                source,
+                documents,
+                self.model_name,
+                self._encode_documents,
+                target=target
+            )
+
+            self._use_embeddings(sync["embeddings"], sync["doc_hashes"], compute_content_hash(sync["doc_hashes"]))
+            self._index_patch = sync
+
+            if not sync["saved"]:
+                # İçerik aynı - kaynak dosyalar yeni snapshot'a link'lenir
+                self._reused_files["embeddings.npy"] = source.matrix_file
+                self._reused_files["embeddings.json"] = source.header_file
+
+            if sync["encoded"] or sync["removed"]:
+                print(f"✅ Embeddings updated: {sync['encoded']} encoded, {len(sync['removed'])} removed, {self.embeddings.shape}")
+            return True
+
+        except Exception as e:
+            print(f"❌ Embedding creation error: {e}")
+            return False
+
+    def _use_embeddings(self, embeddings: np.ndarray, doc_hashes: List[str], content_hash: str):
+        self.embeddings = embeddings
+        self.doc_hashes = doc_hashes
+        self.content_hash = content_hash
+        self._id_to_row = id_to_row_map(doc_hashes)
+
+    def _encode_documents(self, documents: List[str]) -> np.ndarray:
+        """Document'ları batch halinde fp32 modelle encode et - encode_pool varsa worker process'lerde"""
+        started = time.perf_counter()
+        encoder = get_shared_encoder(self.model_name, "torch")
+        if self.encode_pool is not None:
+            embeddings = encoder.encode_multi_process(documents, self.encode_pool,
+                                                      batch_size=self.encode_batch_size)
+        else:
+            embeddings = encoder.encode(
+                documents,
+                batch_size=self.encode_batch_size,
+                show_progress_bar=True,
+                convert_to_numpy=True
+            )
+        self.build_stats["encoded"] += len(documents)
+        self.build_stats["encode_s"] += time.perf_counter() - started
+        return embeddings
+
+    def _prepare_document(self, item: Dict) -> str:
+        """Kaydı document text'e çevir"""
+        return self.document_builder(item)
+
+    def _prepare_documents(self) -> List[str]:
+        """
+        Tüm kayıtların document text'leri - kurulum boyunca bir kez hazırlanır.
+        prepare_workers > 1 ise kayıtlar process havuzunda parça parça işlenir
+        (document_builder modül seviyesinde, pickle edilebilir bir fonksiyon olmalı).
+        """
+        if self._documents is not None:
+            return self._documents
+
+        started = time.perf_counter()
+        if self.prepare_workers > 1 and len(self.items) > self.prepare_workers:
+            chunksize = max(1, len(self.items) // (self.prepare_workers * 4))
+            with ProcessPoolExecutor(max_workers=self.prepare_workers) as executor:
+                self._documents = list(executor.map(self.document_builder, self.items, chunksize=chunksize))
+        else:
+            self._documents = [self._prepare_document(item) for item in self.items]
+        self.build_stats["prepared"] = len(self._documents)
+        self.build_stats["prepare_s"] = time.perf_counter() - started
+        return self._documents
+
+    def _setup_faiss_index(self) -> bool:
+        """FAISS index'i kur - snapshot güncelse doğrudan yükle, corpus değiştiyse yerinde güncelle"""
+
+        try:
+            # Embeddings ve index config manifest'le eşleşiyorsa kontrol O(1): sadece vektör sayısı
+            if self._fresh.get("embeddings") and self._component_fresh(
+                    "index", index_type=self.index_type, index_params=self.index_params,
+                    content_hash=self.content_hash):
+                index_file = os.path.join(self._snapshot_dir, "faiss.index")
+                index = load_index(index_file, self.index_type, self.index_params)
+                if index is not None and index.ntotal == len(self._id_to_row):
+                    self.index = index
+                    self._fresh["index"] = True
+                    self._reused_files["faiss.index"] = index_file
+                    self._reused_files["faiss.index.json"] = index_file + ".json"
+                    print(f"✅ Loaded FAISS index: {self.index.ntotal} vectors")
+                    return True
+
+            patch = self._index_patch or {"full_rebuild": True, "added": [], "removed": []}
+
+            # Önceki index'i yüklemeyi dene ve değişen document'ları ID bazlı ekle/çıkar
+            # IVF tiplerinde eğitilmiş merkezler korunur, yeni vektörler yeniden eğitim olmadan eklenir
+            previous = self._snapshot_file("faiss.index") or (
+                self.legacy_index_file if os.path.exists(self.legacy_index_file) else None)
+            index = None
+            if previous and not patch["full_rebuild"]:
+                print("💾 Loading cached FAISS index...")
+                index = load_index(previous, self.index_type, self.index_params)
+
+            if index is not None:
+                if patch_id_index(index, self.embeddings, self.doc_hashes, patch["added"], patch["removed"]):
+                    self.index = index
+                    if patch["added"] or patch["removed"] or previous == self.legacy_index_file:
+                        save_index(self.index, self._staged_file("faiss.index"), self.index_type, self.index_params)
+                        self._reused_files.pop("faiss.index.json", None)
+                        print(f"✅ FAISS index patched: +{len(patch['added'])} / -{len(patch['removed'])}, {self.index.ntotal} vectors")
+                    else:
+                        self._reused_files["faiss.index"] = previous
+                        self._reused_files["faiss.index.json"] = previous + ".json"
+                        print(f"✅ Loaded FAISS index: {self.index.ntotal} vectors")
+                    return True
+
+                print("⚠️ Cached FAISS index out of sync, rebuilding...")
+
+            # Index oluştur
+            print(f"🔍 Creating FAISS index ({self.index_type})...")
+
+            # ID-mapped inner product index (store'daki vektörler zaten normalize - cosine similarity)
+            self.index = build_id_index(self.embeddings, self.doc_hashes, self.index_type, self.index_params)
+
+            print(f"✅ FAISS index created: {self.index.ntotal} vectors")
+
+            # Yeni snapshot'a kaydet
+            save_index(self.index, self._staged_file("faiss.index"), self.index_type, self.index_params)
+            self._reused_files.pop("faiss.index.json", None)
+            print("💾 FAISS index cached")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ FAISS setup error: {e}")
+            return False
+
+    def _build_category_partitions(self):
+        """Her kategori için ana index'i filtreleyen ID kümesi kur - vektör kopyalanmaz, encode gerektirmez"""
+        if not self.category_key:
+            return
+        self.category_partitions = build_partitions(
+            self.doc_hashes, [item.get(self.category_key) for item in self.items]
+        )
+        sizes = {category: len(partition.rows) for category, partition in self.category_partitions.items()}
+        print(f"✅ Category partitions: {sizes}")
+
+    def _setup_bm25_index(self):
+        """BM25 index'ini snapshot'tan (ya da eski düz cache'ten) yükle - corpus değiştiyse yeniden kur"""
+        for path in (self._snapshot_file("bm25.npz"), self.legacy_bm25_file):
+            self.bm25 = BM25Index.load(path, self.content_hash) if path else None
+            if self.bm25 is not None:
+                self._reused_files["bm25.npz"] = path
+                print(f"✅ Loaded BM25 index: {len(self.bm25.vocabulary)} terms")
+                return
+
+        print("🔤 Creating BM25 index...")
+        self.bm25 = BM25Index()
+        self.bm25.build(self._prepare_documents(), self.content_hash)
+        self.bm25.save(self._staged_file("bm25.npz"))
+        print(f"✅ BM25 index created: {len(self.bm25.vocabulary)} terms")
+
+    def _publish_snapshot(self):
+        """
+        Yeniden kurulan bileşenleri yeni snapshot olarak atomik yayınla; değişmeyen bileşen dosyaları
+        link'lenir. Hiçbir bileşen değişmediyse mevcut snapshot kullanılmaya devam eder.
+        """
+        if self._staging_dir is None:
+            return
+
+        rebuilt = [name for name, files in COMPONENT_FILES.items() if files[0] not in self._reused_files]
+        try:
+            for file_name, path in self._reused_files.items():
+                self.snapshots.reuse(path, self._staging_dir, file_name)
+
+            dim = int(self.embeddings.shape[1])
+            manifest = {
+                "model_name": self.model_name,
+                "dim": dim,
+                "count": len(self.items),
+                "content_hash": self.content_hash,
+                "components": {
+                    "items": {"source": self._source, "count": len(self.items)},
+                    "embeddings": {"model_name": self.model_name, "dim": dim, "count": len(self.embeddings),
+                                   "content_hash": self.content_hash},
+                    "index": {"index_type": self.index_type, "index_params": self.index_params,
+                              "content_hash": self.content_hash, "ntotal": int(self.index.ntotal)},
+                    "bm25": {"content_hash": self.content_hash, "terms": len(self.bm25.vocabulary)}
+                }
+            }
+            self._snapshot_dir = self.snapshots.commit(self._staging_dir, manifest)
+            self._manifest = self.snapshots.read_manifest()
+            print(f"💾 Snapshot {os.path.basename(self._snapshot_dir)} published (rebuilt: {', '.join(rebuilt)})")
+
+        except Exception as e:
+            # Yayınlanamasa da bellekteki bileşenler geçerli - arama çalışmaya devam eder
+            print(f"⚠️ Snapshot publish failed: {e}")
+            self.snapshots.discard(self._staging_dir)
+
+        finally:
+            self._staging_dir = None
+
+    def search(self, query: str, top_k: Optional[int] = None, threshold: float = 0.1,
+               category_filter: Optional[str] = None, mode: Optional[str] = None) -> List[Dict]:
+        """Ana arama fonksiyonu - mode verilmezse self.search_mode"""
+
+        if not self.is_searchable():
+            print("❌ RAG system not initialized!")
+            return []
+
+        top_k = top_k or self.DEFAULT_TOP_K
+
+        try:
+            print(f"🔍 Searching: '{query}' (top-{top_k})")
+            if category_filter:
+                print(f"🏷️ Category filter: {category_filter}")
+
+            results = self.search_with_embedding(query, None, top_k, threshold, category_filter,
+                                                 mode, verbose=True)
+
+            print(f"✅ Found {len(results)} results above threshold")
+            return results
+
+        except Exception as e:
+            print(f"❌ Search error: {e}")
+            return []
+
+    def search_with_embedding(self, query: str, query_embedding: Optional[np.ndarray], top_k: int,
+                              threshold: float = 0.1, category_filter: Optional[str] = None,
+                              mode: Optional[str] = None, verbose: bool = False) -> List[Dict]:
+        """
+        Önceden encode edilmiş (normalize, tek satır) sorgu vektörüyle ara - aynı modeli paylaşan
+        birden fazla corpus tek encode ile aranabilir. query_embedding None ise gerektiğinde encode edilir.
+        """
+        mode = self._resolve_mode(query, mode, category_filter)
+
+        if mode == "sparse":
+            # Anahtar kelime sorgusu - FAISS search atlanır
+            return self._sparse_results(query, query_embedding, top_k, category_filter, verbose=verbose)
+
+        # Query embedding - LRU cache'ten, yoksa encode edilir (normalize edilmiş)
+        if query_embedding is None:
+            query_embedding = self.query_cache.encode([query], self._encode_queries)[0]
+        query_embedding = np.ascontiguousarray(query_embedding, dtype=np.float32).reshape(1, -1)
+
+        # FAISS search - filtre varsa sadece o kategorinin alt-index'inde
+        similarities, rows = self._search_rows(query_embedding, top_k, category_filter)
+
+        # Results formatla
+        return self._ranked_results(query, mode, query_embedding[0], similarities[0], rows[0],
+                                    top_k, threshold, category_filter, verbose=verbose)
+
+    def search_batch(self, queries: List[str], top_k: Optional[int] = None,
+                     threshold: Union[float, List[float]] = 0.1,
+                     category_filters: Optional[List[Optional[str]]] = None,
+                     mode: Optional[str] = None) -> List[List[Dict]]:
+        """
+        Çoklu sorgu arama - dense arama gereken sorgular tek forward pass'te encode edilir; filtresiz
+        sorgular tek bir FAISS search çağrısında, filtreliler kategori başına tek çağrıda aranır.
+        threshold ve category_filters sorgu başına verilebilir.
+        """
+
+        if not self.is_searchable():
+            print("❌ RAG system not initialized!")
+            return [[] for _ in queries]
+
+        if not queries:
+            return []
+
+        top_k = top_k or self.DEFAULT_TOP_K
+        thresholds = threshold if isinstance(threshold, (list, tuple)) else [threshold] * len(queries)
+        filters = category_filters or [None] * len(queries)
+        if len(thresholds) != len(queries) or len(filters) != len(queries):
+            raise ValueError("thresholds/category_filters length must match queries")
+
+        try:
+            modes = [self._resolve_mode(query, mode, filters[i]) for i, query in enumerate(queries)]
+            batch_results: List[List[Dict]] = [[] for _ in queries]
+
+            # Anahtar kelime sorguları sadece BM25 ile - vektörleri (cosine için) dense sorgularla aynı encode'da
+            dense_positions = [i for i in range(len(queries)) if modes[i] != "sparse"]
+            sparse_positions = [i for i in range(len(queries)) if modes[i] == "sparse"]
+            encode_positions = dense_positions + (sparse_positions if self.encoder_ready else [])
+
+            query_embeddings = None
+            if encode_positions:
+                # (n, dim) sorgu matrisi - cache'te olmayanlar tek encode çağrısında
+                query_embeddings = self.query_cache.encode([queries[i] for i in encode_positions],
+                                                           self._encode_queries)
+
+            for n, i in enumerate(sparse_positions, len(dense_positions)):
+                sparse_embedding = query_embeddings[n] if n < len(encode_positions) else None
+                batch_results[i] = self._sparse_results(queries[i], sparse_embedding, top_k, filters[i])
+
+            if dense_positions:
+
+                # Sorguları filtreye göre grupla - her grup tek search çağrısı
+                groups: Dict[Optional[str], List[int]] = {}
+                for j, i in enumerate(dense_positions):
+                    groups.setdefault(filters[i] or None, []).append(j)
+
+                for category_filter, positions in groups.items():
+                    similarities, rows = self._search_rows(query_embeddings[positions], top_k, category_filter)
+                    for n, j in enumerate(positions):
+                        i = dense_positions[j]
+                        batch_results[i] = self._ranked_results(
+                            queries[i], modes[i], query_embeddings[j], similarities[n], rows[n],
+                            top_k, thresholds[i], category_filter
+                        )
+
+            print(f"✅ Batch search: {len(queries)} queries, {sum(len(r) for r in batch_results)} results")
+            return batch_results
+
+        except Exception as e:
+            print(f"❌ Batch search error: {e}")
+            return [[] for _ in queries]
+
+    def _search_rows(self, query_embeddings: np.ndarray, top_k: int,
+                     category_filter: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ana index'te ara, kategori filtresi varsa sadece o kategorinin ID'leri arasında - (similarities,
+        corpus satırları) döner. Bilinmeyen kategori için boş sonuç döner. Sıkıştırılmış index'lerde
+        top_k * rerank_factor aday kesin cosine ile yeniden sıralanır.
+        """
+        if category_filter:
+            partition = self.category_partitions.get(category_filter)
+            if partition is None:
+                empty = np.zeros((len(query_embeddings), 0))
+                return empty.astype(np.float32), empty.astype(np.int64)
+            candidates = min(top_k * self.rerank_factor, len(partition))
+            similarities, rows = search_partition(self.index, partition, query_embeddings, candidates)
+        else:
+            candidates = min(top_k * self.rerank_factor, self.index.ntotal)
+            similarities, ids = self.index.search(query_embeddings, candidates)
+            rows = np.vectorize(lambda i: self._id_to_row.get(int(i), -1), otypes=[np.int64])(ids)
+
+        if self.rerank_factor > 1:
+            return rerank_exact(self.embeddings, query_embeddings, rows, min(top_k, candidates))
+        return similarities, rows
+
+    def _resolve_mode(self, query: str, mode: Optional[str] = None,
+                      category_filter: Optional[str] = None) -> str:
+        """auto modunu çöz: kısa sorgunun tüm terimlerini içeren bir document varsa sparse, yoksa hybrid"""
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode} (expected one of {SEARCH_MODES})")
+        if self.model is None or self.index is None:
+            # Arka plan kurulumu sürüyor - encoder hazır olana kadar BM25 ile cevapla
+            return "sparse"
+        if self.bm25 is None:
+            return "dense"
+        if mode != "auto":
+            return mode
+
+        known, unknown = self.bm25.known_terms(query)
+        if not known or unknown or len(known) > KEYWORD_QUERY_MAX_TERMS:
+            return "hybrid"
+
+        # En az bir document (filtre varsa o kategoride) tüm terimleri içermeli
+        _, matched = self.bm25.score(query)
+        if category_filter:
+            partition = self.category_partitions.get(category_filter)
+            matched = matched[partition.rows] if partition is not None else matched[:0]
+        return "sparse" if len(matched) and matched.max() == len(known) else "hybrid"
+
+    def _sparse_rows(self, query: str, top_k: int,
+                     category_filter: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 araması - (en iyi skora oranlanmış BM25 skorları (0-1), corpus satırları) döner"""
+        allowed_rows = None
+        if category_filter:
+            partition = self.category_partitions.get(category_filter)
+            allowed_rows = partition.rows if partition is not None else np.zeros(0, dtype=np.int64)
+
+        scores, rows = self.bm25.search(query, top_k, allowed_rows)
+        if len(scores):
+            scores = scores / scores[0]
+        return scores, rows
+
+    def _sparse_results(self, query: str, query_embedding: Optional[np.ndarray], top_k: int,
+                        category_filter: Optional[str] = None, verbose: bool = False) -> List[Dict]:
+        """
+        Sadece BM25 sonuçları, BM25 sırasıyla. 'similarity' diğer modlardaki gibi embedding satırından
+        hesaplanan cosine'dir (sorgu vektörü yoksa None); oransal BM25 skoru 'bm25_score'da döner.
+        Hepsi tam terim eşleşmesi olduğundan cosine eşiği uygulanmaz (hybrid'deki BM25 adayları gibi).
+        """
+        bm25_scores, rows = self._sparse_rows(query, top_k, category_filter)
+        similarities = [None] * len(rows)
+        if query_embedding is None and len(rows) and self.encoder_ready:
+            query_embedding = self.query_cache.encode([query], self._encode_queries)[0]
+        # Vektör dışarıdan (aynı modeli paylaşan başka motordan) geldiyse bu motorun encoder'ı gerekmez
+        if query_embedding is not None and len(rows) and self.embeddings is not None:
+            query_embedding = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+            similarities = (np.asarray(self.embeddings[rows], dtype=np.float32) @ query_embedding).tolist()
+
+        results = []
+        for similarity, bm25_score, row in zip(similarities, bm25_scores, rows):
+            item = self.items[row]
+            results.append({
+                self.result_key: item,
+                'similarity': similarity,
+                'bm25_score': float(bm25_score),
+                'rank': len(results) + 1
+            })
+
+            if verbose:
+                shown = f"{similarity:.3f}" if similarity is not None else "-"
+                print(f"📊 {len(results)}. {item.get('name', 'N/A')} ({item.get(self.category_key, 'N/A')}) - Similarity: {shown}, BM25: {bm25_score:.3f}")
+
+            if len(results) >= top_k:
+                break
+
+        return results
+
+    def _ranked_results(self, query: str, mode: str, query_embedding: np.ndarray,
+                        similarities: np.ndarray, rows: np.ndarray, top_k: int, threshold: float,
+                        category_filter: Optional[str] = None, verbose: bool = False) -> List[Dict]:
+        """
+        Dense sonuçları hybrid modda BM25 sonuçlarıyla RRF üzerinden birleştir.
+        Birleşik listede benzerlik her zaman embedding satırından hesaplanan cosine'dir; eşik sadece
+        BM25'in bulmadığı adaylara uygulanır (tam terim eşleşmeleri düşük cosine ile elenmez).
+        """
+        if mode != "hybrid":
+            return self._collect_results(similarities, rows, top_k, threshold, verbose=verbose)
+
+        dense_rows = [int(row) for row in rows if row >= 0]
+        _, sparse_rows = self._sparse_rows(query, top_k, category_filter)
+        sparse_set = set(sparse_rows.tolist())
+
+        fused = [row for row, _ in reciprocal_rank_fusion([dense_rows, sparse_rows.tolist()], k=self.rrf_k)]
+        fused_rows = np.array(fused, dtype=np.int64)
+        fused_similarities = (np.asarray(self.embeddings[fused_rows], dtype=np.float32) @ query_embedding
+                              if len(fused_rows) else np.zeros(0, dtype=np.float32))
+
+        keep = np.array([row in sparse_set or sim >= threshold
+                         for row, sim in zip(fused, fused_similarities)], dtype=bool)
+        return self._collect_results(fused_similarities[keep], fused_rows[keep], top_k,
+                                     float("-inf"), verbose=verbose)
+
+    def _collect_results(self, similarities: np.ndarray, rows: np.ndarray, top_k: int,
+                         threshold: float, verbose: bool = False) -> List[Dict]:
+        """Tek bir sorgunun arama sonuçlarını eşik filtresiyle sonuç listesine çevir"""
+        results = []
+        for similarity, row in zip(similarities, rows):
+
+            if similarity < threshold or row < 0:
+                continue
+
+            item = self.items[row]
+
+            result = {
+                self.result_key: item,
+                'similarity': float(similarity),
+                'rank': len(results) + 1
+            }
+            results.append(result)
+
+            if verbose:
+                print(f"📊 {len(results)}. {item.get('name', 'N/A')} ({item.get(self.category_key, 'N/A')}) - Similarity: {similarity:.3f}")
+
+            # İstenen sayıya ulaştık mı?
+            if len(results) >= top_k:
+                break
+
+        return results
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Sorguları encode et (query cache miss durumunda çağrılır)"""
+        return self.model.encode(queries, convert_to_numpy=True)
+
+    def benchmark_indexes(self, queries: List[str], top_k: int = 10,
+                          backends: Optional[List[str]] = None) -> List[Dict]:
+        """Index tiplerini gerçek sorgularla flat baseline'a karşı ölç (recall@k, p50/p99 gecikme)"""
+
+        if not self.model or self.embeddings is None:
+            print("❌ RAG system not initialized!")
+            return []
+
+        query_embeddings = self.query_cache.encode(queries, self._encode_queries)
+        report = benchmark_index_backends(
+            self.embeddings, self.doc_hashes, query_embeddings, top_k, backends,
+            {self.index_type: self.index_params}
+        )
+        print_report(report)
+        return report
+
+    def benchmark_encoders(self, queries: List[str], top_k: int = 5,
+                           backends: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Encoder backend'lerini fp32 torch'a karşı ölç: sorgu embedding'lerinin cosine uyumu,
+        corpus üzerinde top-k örtüşmesi ve tek sorgu encode gecikmesi (p50/p99)
+        """
+        if self.embeddings is None:
+            print("❌ RAG system not initialized!")
+            return []
+
+        report = benchmark_encoder_backends(self.model_name, self.embeddings, queries, top_k, backends)
+        print_report(report)
+        return report
+
+    def get_categories(self) -> List[str]:
+        """Mevcut kategorileri listele"""
+        categories = set()
+        for item in self.items:
+            if self.category_key in item:
+                categories.add(item[self.category_key])
+        return sorted(list(categories))
+
+    def search_by_category(self, category: str, top_k: int = 10,
+                           query: Optional[str] = None) -> List[Dict]:
+        """Kategoriye göre direkt arama - query verilirse kategori içinde benzerliğe göre sıralanır"""
+        partition = self.category_partitions.get(category)
+        if partition is None:
+            print(f"✅ Found 0 {self.collection_key} in category '{category}'")
+            return []
+
+        if query:
+            results = self.search(query, top_k=top_k, threshold=-1.0, category_filter=category)
+            print(f"✅ Found {len(results)} {self.collection_key} in category '{category}'")
+            return results
+
+        category_items = [self.items[row] for row in partition.rows[:top_k]]
+
+        results = []
+        for i, item in enumerate(category_items):
+            result = {
+                self.result_key: item,
+                'similarity': 1.0,  # Exact match
+                'rank': i + 1
+            }
+            results.append(result)
+
+        print(f"✅ Found {len(results)} {self.collection_key} in category '{category}'")
+        return results
+
+    def format_for_gemini(self, results: List[Dict], max_context: int = 3000) -> str:
+        """Sonuçları Gemini için formatla"""
+        return self.formatter(results, max_context)
+
+    def get_memory_stats(self) -> Dict:
+        """
+        Vektör belleği (byte): embedding matrisi memmap'li (page cache, worker'lar arasında paylaşılır),
+        index process heap'inde. Kategori filtreleri vektör tutmaz, sadece ID listeleri
+        """
+        return {
+            'embeddings_mmap_bytes': int(self.embeddings.nbytes) if self.embeddings is not None else 0,
+            'index_bytes': index_memory_bytes(self.index),
+            'partition_bytes': sum(partition.memory_bytes() for partition in self.category_partitions.values())
+        }
+
+    def get_stats(self) -> Dict:
+        """Sistem istatistikleri"""
+
+        return {
+            f'{self.collection_key}_count': len(self.items),
+            'categories': self._category_counts() if self.category_key else {},
+            'embedding_shape': self.embeddings.shape if self.embeddings is not None else None,
+            'index_vectors': self.index.ntotal if self.index else 0,
+            'index_type': self.index_type,
+            'rerank_factor': self.rerank_factor,
+            'memory': self.get_memory_stats(),
+            'model_name': self.model_name,
+            'encoder_backend': self.encoder_backend,
+            'cache_dir': self.cache_dir,
+            'snapshot': (self._manifest or {}).get('snapshot'),
+            'query_cache': self.query_cache.get_stats(),
+            'search_mode': self.search_mode,
+            'bm25': self.bm25.get_stats() if self.bm25 else None,
+            'readiness': self.get_readiness()
+        }
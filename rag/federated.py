@@ -0,0 +1,154 @@
+# rag/federated.py - Birden fazla corpus üzerinde tek encode ile paralel arama
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from rag.engine import RAGEngine
+
+CALIBRATION_SAMPLE_SIZE = 512
+
+
+class FederatedRetriever:
+    """
+    Aynı embedding modelini paylaşan RAG motorlarını birlikte arar.
+    Sorgu bir kez encode edilir, her corpus paralel aranır; sonuçların cosine benzerliği
+    corpus'un kendi benzerlik dağılımına göre z-skora çevrilir ve tek listede birleştirilir.
+    Böylece bir corpus'un sıradan sonucu diğerinin gerçekten ilgili sonucunu geçemez.
+    """
+
+    def __init__(self, engines: Dict[str, RAGEngine], labels: Optional[Dict[str, str]] = None,
+                 calibration_size: int = CALIBRATION_SAMPLE_SIZE):
+        self.engines = {name: engine for name, engine in engines.items() if engine is not None}
+        if not self.engines:
+            raise ValueError("FederatedRetriever needs at least one engine")
+
+        encoders = {(engine.model_name, engine.encoder_backend) for engine in self.engines.values()}
+        if len(encoders) > 1:
+            raise ValueError(f"Federated engines must share one embedding model and backend, got {encoders}")
+
+        self.labels = {name: (labels or {}).get(name, engine.name) for name, engine in self.engines.items()}
+        self.primary = next(iter(self.engines.values()))
+        self.calibration_size = calibration_size
+        self._executor = ThreadPoolExecutor(max_workers=len(self.engines), thread_name_prefix="federated")
+
+        # Skor kalibrasyonu için corpus başına sabit örnek satırlar - embedding'ler yüklenince hesaplanır
+        # (motorlar arka planda kuruluyor olabilir)
+        self._calibration: Dict[str, np.ndarray] = {}
+
+    def _calibration_sample(self, name: str) -> Optional[np.ndarray]:
+        sample = self._calibration.get(name)
+        if sample is None:
+            embeddings = self.engines[name].embeddings
+            if embeddings is None:
+                return None
+            rng = np.random.default_rng(0)
+            rows = np.sort(rng.choice(len(embeddings), size=min(len(embeddings), self.calibration_size),
+                                      replace=False))
+            sample = np.ascontiguousarray(embeddings[rows], dtype=np.float32)
+            self._calibration[name] = sample
+        return sample
+
+    def _normalize(self, name: str, similarities: np.ndarray, query_embedding: np.ndarray) -> Optional[np.ndarray]:
+        """Cosine benzerliklerini corpus'un örnek dağılımına göre z-skora çevir - örnek yoksa None"""
+        sample = self._calibration_sample(name)
+        if sample is None or len(sample) < 2:
+            return None
+        background = sample @ query_embedding
+        return (similarities - background.mean()) / max(float(background.std()), 1e-6)
+
+    def _encode(self, query: str) -> Optional[np.ndarray]:
+        """Sorguyu bir kez encode et - encoder'ı hazır olan herhangi bir motorla (hepsi aynı modeli paylaşır)"""
+        for engine in self.engines.values():
+            if engine.encoder_ready:
+                return engine.query_cache.encode([query], engine._encode_queries)[0]
+        return None
+
+    def _search_corpus(self, name: str, query: str, query_embedding: Optional[np.ndarray],
+                       top_k: int, threshold: float) -> List[Dict]:
+        engine = self.engines[name]
+        if not engine.is_searchable():
+            return []
+
+        # Vektör zaten hazır - sparse kısa yolu yerine hybrid (BM25 yoksa dense), benzerlik hep cosine.
+        # Motor henüz kuruluyorsa BM25'e düşer; cosine'i ya da kalibrasyonu olmayan sonuçların skoru None
+        results = engine.search_with_embedding(query, query_embedding, top_k, threshold, mode="hybrid")
+        if not results:
+            return []
+
+        scores = [None] * len(results)
+        if query_embedding is not None and all(r['similarity'] is not None for r in results):
+            normalized = self._normalize(name, np.array([r['similarity'] for r in results], dtype=np.float32),
+                                         query_embedding)
+            if normalized is not None:
+                scores = [float(score) for score in normalized]
+
+        for result, score in zip(results, scores):
+            result['corpus'] = name
+            result['score'] = score
+        return results
+
+    def search(self, query: str, top_k: int = 15, threshold: float = 0.1,
+               per_corpus_k: Optional[int] = None) -> List[Dict]:
+        """
+        Tüm corpus'larda ara ve normalize skora göre birleşik top_k döndür.
+        Normalize edilemeyen sonuçlar (kurulumu süren motorlar) ölçekleri karşılaştırılamadığı için
+        normalize olanların arkasına, corpus içi sıralarıyla dönüşümlü eklenir.
+        """
+        print(f"🔍 Federated search: '{query}' across {list(self.engines)}")
+
+        query_embedding = self._encode(query)
+
+        per_corpus_k = per_corpus_k or top_k
+        futures = {
+            name: self._executor.submit(self._search_corpus, name, query, query_embedding, per_corpus_k, threshold)
+            for name in self.engines
+        }
+
+        normalized, unnormalized = [], []
+        for name, future in futures.items():
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"⚠️ Federated search failed for {name}: {e}")
+                continue
+            for result in results:
+                (normalized if result['score'] is not None else unnormalized).append(result)
+
+        normalized.sort(key=lambda result: result['score'], reverse=True)
+        # Corpus içi rank'e göre sıralama (stabil) corpus'ları dönüşümlü dizer
+        unnormalized.sort(key=lambda result: result['rank'])
+        merged = (normalized + unnormalized)[:top_k]
+        for rank, result in enumerate(merged, 1):
+            result['rank'] = rank
+
+        print(f"✅ Federated: {len(merged)} results " +
+              str({name: sum(1 for r in merged if r['corpus'] == name) for name in self.engines}))
+        return merged
+
+    def format_for_gemini(self, results: List[Dict], max_context: int = 3000) -> str:
+        """
+        Birleşik sonuçları tek context'e çevir - her corpus kendi formatter'ıyla, en iyi sonucu
+        yüksek olan corpus önce; context bütçesi corpus'lara sonuç sayısına göre bölünür.
+        """
+        if not results:
+            return self.primary.format_for_gemini([], max_context)
+
+        grouped: Dict[str, List[Dict]] = {}
+        for result in results:
+            grouped.setdefault(result['corpus'], []).append(result)
+
+        sections = []
+        for name, corpus_results in grouped.items():
+            budget = max_context * len(corpus_results) // len(results)
+            context = self.engines[name].format_for_gemini(corpus_results, max_context=budget)
+            sections.append(f"**{self.labels[name]}:**\n{context}")
+        return "\n\n".join(sections)
+
+    def get_stats(self) -> Dict:
+        return {
+            "corpora": {name: len(engine.items) for name, engine in self.engines.items()},
+            "model_name": self.primary.model_name,
+            "encoder_backend": self.primary.encoder_backend,
+            "readiness": {name: engine.get_readiness() for name, engine in self.engines.items()}
+        }
@@ -0,0 +1,273 @@
+# rag/index_builder.py - Stabil ID'li FAISS index kurulumu ve yerinde güncelleme
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from rag.embedding_store import document_id
+
+# Desteklenen index tipleri - flat kesin sonuç verir, diğerleri büyük corpus'lar için yaklaşık arama.
+# sq8 / sq_fp16 vektörleri boyut başına 1 / 2 byte saklar (float32'nin 1/4'ü / 1/2'si)
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "sq_fp16")
+
+# rerank_factor: sıkıştırılmış index'ten top_k * rerank_factor aday alınır, memmap'li float32
+# embedding'lerle kesin cosine hesaplanıp yeniden sıralanır
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "hnsw": {"M": 32, "ef_construction": 80, "ef_search": 64},
+    "ivf_flat": {"nlist": 256, "nprobe": 16},
+    "ivf_pq": {"nlist": 256, "nprobe": 16, "m": 48, "nbits": 8, "rerank_factor": 4},
+    "sq8": {"rerank_factor": 4},
+    "sq_fp16": {"rerank_factor": 2},
+}
+
+
+def unique_rows(doc_hashes: List[str]) -> Tuple[np.ndarray, List[int]]:
+    """(FAISS ID'leri, satırlar) - aynı içerikli document'lar tek ID ile bir kez eklenir"""
+    seen = set()
+    ids, rows = [], []
+    for row, doc_hash in enumerate(doc_hashes):
+        if doc_hash in seen:
+            continue
+        seen.add(doc_hash)
+        ids.append(document_id(doc_hash))
+        rows.append(row)
+    return np.array(ids, dtype=np.int64), rows
+
+
+def id_to_row_map(doc_hashes: List[str]) -> Dict[int, int]:
+    """FAISS ID -> corpus satırı eşlemesi"""
+    ids, rows = unique_rows(doc_hashes)
+    return dict(zip(ids.tolist(), rows))
+
+
+def resolve_index_params(index_type: str, index_params: Optional[Dict],
+                         count: int, dim: int) -> Dict:
+    """
+    Varsayılan parametreleri kullanıcı parametreleriyle birleştir ve corpus boyutuna göre sınırla
+    (IVF/PQ eğitimi için merkez sayısı <= count / 39, PQ için m | dim).
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+
+    params = dict(DEFAULT_INDEX_PARAMS[index_type])
+    params.update(index_params or {})
+
+    if "nlist" in params:
+        params["nlist"] = max(1, min(int(params["nlist"]), count // 39))
+        params["nprobe"] = max(1, min(int(params["nprobe"]), params["nlist"]))
+    if index_type == "ivf_pq":
+        m = min(int(params["m"]), dim)
+        while dim % m:
+            m -= 1
+        params["m"] = m
+        params["nbits"] = max(1, min(int(params["nbits"]), int(np.log2(max(count // 39, 2)))))
+    return params
+
+
+def _factory_string(index_type: str, params: Dict) -> str:
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{params['M']}"
+    if index_type == "ivf_flat":
+        return f"IDMap2,IVF{params['nlist']},Flat"
+    if index_type == "sq8":
+        return "IDMap2,SQ8"
+    if index_type == "sq_fp16":
+        return "IDMap2,SQfp16"
+    return f"IDMap2,IVF{params['nlist']},PQ{params['m']}x{params['nbits']}"
+
+
+def configure_search(index: faiss.Index, params: Dict):
+    """Arama zamanı parametrelerini (HNSW efSearch, IVF nprobe) uygula - bunlar eğitim gerektirmez"""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if "nprobe" in params and hasattr(base, "nprobe"):
+        base.nprobe = int(params["nprobe"])
+    if "ef_search" in params and hasattr(base, "hnsw"):
+        base.hnsw.efSearch = int(params["ef_search"])
+
+
+def build_id_index(embeddings: np.ndarray, doc_hashes: List[str], index_type: str = "flat",
+                   index_params: Optional[Dict] = None) -> faiss.Index:
+    """
+    Normalize vektörlerle ID-mapped inner product index kur (cosine similarity).
+    IVF tipleri corpus vektörleriyle eğitilir; eğitilmiş durum index dosyasıyla birlikte saklanır.
+    """
+    ids, rows = unique_rows(doc_hashes)
+    dim = embeddings.shape[1]
+
+    if index_type != "flat" and len(rows) < 2:
+        print(f"⚠️ Corpus too small for '{index_type}' index, using flat")
+        index_type = "flat"
+
+    params = resolve_index_params(index_type, index_params, len(rows), dim)
+    index = faiss.index_factory(dim, _factory_string(index_type, params), faiss.METRIC_INNER_PRODUCT)
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = int(params["ef_construction"])
+    configure_search(index, params)
+
+    if rows:
+        vectors = np.ascontiguousarray(embeddings[rows], dtype=np.float32)
+        if not index.is_trained:
+            print(f"🎯 Training {index_type} index on {len(rows)} vectors...")
+            index.train(vectors)
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def save_index(index: faiss.Index, index_file: str, index_type: str, index_params: Optional[Dict]):
+    """Index'i ve hangi config ile kurulduğunu (yan .json dosyası) kaydet"""
+    faiss.write_index(index, index_file)
+    with open(index_file + ".json", "w", encoding="utf-8") as f:
+        json.dump({"index_type": index_type, "index_params": index_params or {}}, f)
+
+
+def load_index(index_file: str, index_type: str, index_params: Optional[Dict]) -> Optional[faiss.Index]:
+    """
+    Kaydedilmiş index'i yükle - istenen config ile kurulmamışsa None döner (yeniden kurulmalı).
+    Config dosyası olmayan eski index'ler flat kabul edilir.
+    """
+    if not os.path.exists(index_file):
+        return None
+
+    try:
+        with open(index_file + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        meta = {"index_type": "flat", "index_params": {}}
+
+    if meta.get("index_type") != index_type or meta.get("index_params") != (index_params or {}):
+        print(f"⚠️ Cached index config ({meta.get('index_type')}) differs from requested ({index_type})")
+        return None
+
+    index = faiss.read_index(index_file)
+    configure_search(index, resolve_index_params(index_type, index_params, index.ntotal, index.d))
+    return index
+
+
+def patch_id_index(index: faiss.Index, embeddings: np.ndarray, doc_hashes: List[str],
+                   added: List[str], removed: List[str]) -> bool:
+    """
+    Mevcut ID-mapped index'i yerinde güncelle: silinen document'ları çıkar, yenileri ekle.
+    Index beklenen durumla tutarlı değilse False döner (çağıran index'i baştan kurmalı).
+    """
+    if not isinstance(index, faiss.IndexIDMap2):
+        return False
+
+    try:
+        # HNSW gibi bazı index tipleri remove_ids desteklemez
+        if removed:
+            remove_ids = np.array([document_id(h) for h in removed], dtype=np.int64)
+            index.remove_ids(remove_ids)
+
+        if added:
+            rows_by_hash = {}
+            for row, doc_hash in enumerate(doc_hashes):
+                rows_by_hash.setdefault(doc_hash, row)
+            rows = [rows_by_hash[h] for h in added]
+            add_ids = np.array([document_id(h) for h in added], dtype=np.int64)
+            index.add_with_ids(np.ascontiguousarray(embeddings[rows], dtype=np.float32), add_ids)
+    except RuntimeError as e:
+        print(f"⚠️ Index patch failed: {e}")
+        return False
+
+    return index.ntotal == len(set(doc_hashes))
+
+
+def index_memory_bytes(index: Optional[faiss.Index]) -> int:
+    """Index'in kod (vektör) belleği - flat/SQ tiplerinde kesin, diğerlerinde serialize boyutu"""
+    if index is None:
+        return 0
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if hasattr(base, "code_size") and not hasattr(base, "invlists"):
+        return int(base.code_size) * int(base.ntotal)
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def rerank_exact(embeddings: np.ndarray, queries: np.ndarray, rows: np.ndarray,
+                 k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aday satırları float32 embedding'lerle kesin cosine'e göre yeniden sırala - (similarities, satırlar),
+    eksik pozisyonlar -1. Sıkıştırılmış index'lerin yaklaşık skorlarını düzeltir.
+    """
+    similarities = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    ranked = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, query in enumerate(queries):
+        candidates = np.unique(rows[i][rows[i] >= 0])  # Sıralı satırlar - memmap'ten ardışık okuma
+        if not len(candidates):
+            continue
+        exact = np.asarray(embeddings[candidates], dtype=np.float32) @ query
+        order = np.argsort(-exact)[:k]
+        similarities[i, :len(order)] = exact[order]
+        ranked[i, :len(order)] = candidates[order]
+    return similarities, ranked
+
+
+class Partition:
+    """
+    Corpus'un bir alt kümesi (örn. bir kategori) - ayrı vektör kopyası tutulmaz, arama ana index'te
+    IDSelectorBatch ile bu satırların FAISS ID'lerine sınırlanır (index'in codec'i ve sıkıştırması aynen geçerli).
+    rows: corpus satırları (corpus sırasıyla), ids / id_rows: sıralı FAISS ID'leri ve karşılık gelen satırlar.
+    """
+
+    def __init__(self, rows: List[int], doc_hashes: List[str]):
+        self.rows = np.array(rows, dtype=np.int64)
+        # Aynı içerikli document'lar tek ID paylaşır - ID, alt kümedeki ilk satıra çözülür
+        first_rows: Dict[int, int] = {}
+        for row in rows:
+            first_rows.setdefault(document_id(doc_hashes[row]), row)
+        self.ids = np.array(sorted(first_rows), dtype=np.int64)
+        self.id_rows = np.array([first_rows[i] for i in self.ids.tolist()], dtype=np.int64)
+        self.selector = faiss.IDSelectorBatch(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to_rows(self, ids: np.ndarray) -> np.ndarray:
+        """FAISS ID'leri -> corpus satırları, alt kümede olmayanlar (ve -1) -1"""
+        positions = np.clip(np.searchsorted(self.ids, ids), 0, max(len(self.ids) - 1, 0))
+        if not len(self.ids):
+            return np.full(ids.shape, -1, dtype=np.int64)
+        return np.where(self.ids[positions] == ids, self.id_rows[positions], -1)
+
+    def memory_bytes(self) -> int:
+        # ID listeleri (selector'ın kendi ID kümesi ~ aynı boyutta) - vektör yok
+        return int(self.rows.nbytes + 2 * self.ids.nbytes + self.id_rows.nbytes)
+
+
+def build_partitions(doc_hashes: List[str], keys: List[Optional[str]]) -> Dict[str, Partition]:
+    """Anahtar (örn. kategori) başına ana index'i filtreleyen Partition kur - anahtarı None olan satırlar atlanır"""
+    rows_by_key: Dict[str, List[int]] = {}
+    for row, key in enumerate(keys):
+        if key is not None:
+            rows_by_key.setdefault(key, []).append(row)
+    return {key: Partition(rows, doc_hashes) for key, rows in rows_by_key.items()}
+
+
+def search_partition(index: faiss.Index, partition: Partition, queries: np.ndarray,
+                     k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ana index'te sadece partition'ın ID'leri arasında ara - (similarities, corpus satırları), boş pozisyonlar -1.
+    HNSW / IVF'te filtre seçiciyse aday kaybolmasın diye efSearch / nprobe seçicilik oranıyla büyütülür.
+    """
+    k = min(k, len(partition))
+    if k == 0:
+        return (np.zeros((len(queries), 0), dtype=np.float32),
+                np.zeros((len(queries), 0), dtype=np.int64))
+
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    ratio = index.ntotal / len(partition)
+    if hasattr(base, "hnsw"):
+        params = faiss.SearchParametersHNSW(
+            sel=partition.selector, efSearch=int(min(index.ntotal, max(base.hnsw.efSearch, k) * ratio)))
+    elif hasattr(base, "nprobe"):
+        params = faiss.SearchParametersIVF(
+            sel=partition.selector, nprobe=int(min(base.nlist, np.ceil(base.nprobe * ratio))))
+    else:
+        params = faiss.SearchParameters(sel=partition.selector)
+
+    similarities, ids = index.search(queries, k, params=params)
+    return similarities, partition.to_rows(ids)
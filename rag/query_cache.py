@@ -0,0 +1,126 @@
+# rag/query_cache.py - Sorgu metni -> normalize embedding LRU cache
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from rag.embedding_store import normalize_rows
+
+# v3: anahtar sorgunun kendisi - v1/v2 dosyalarında normalize anahtar altında farklı yazılışların vektörü olabilir
+QUERY_CACHE_FORMAT_VERSION = 3
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache: sorgu metni (anahtar, olduğu gibi) -> L2 normalize float32 embedding.
+    disk_path verilirse cache .npy + .json olarak diske yazılır ve sonraki açılışta yüklenir.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 1024,
+                 disk_path: Optional[str] = None, flush_every: int = 32):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.flush_every = flush_every
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.hits = 0
+        self.misses = 0
+
+        if disk_path:
+            self._load_from_disk()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty += 1
+            should_flush = self.disk_path and self._dirty >= self.flush_every
+
+        if should_flush:
+            self.flush()
+
+    def encode(self, queries: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Sorguları (n, dim) normalize matris olarak döndür.
+        Sadece cache'te olmayanlar tek bir encode_fn çağrısıyla encode edilir. Anahtar sorgunun kendisidir
+        (küçük harf / boşluk normalizasyonu yok): tokenizer büyük-küçük harf duyarlı, vektör sadece
+        anahtara bağlı kalır ve cache'siz arama ile aynı sonucu verir.
+        """
+        vectors: List[Optional[np.ndarray]] = [self.get(query) for query in queries]
+
+        missing = list(OrderedDict.fromkeys(q for q, vec in zip(queries, vectors) if vec is None))
+        if missing:
+            encoded = normalize_rows(encode_fn(missing))
+            fresh = dict(zip(missing, encoded))
+            for query, vector in fresh.items():
+                self.put(query, vector)
+            vectors = [vec if vec is not None else fresh[query] for query, vec in zip(queries, vectors)]
+
+        # FAISS yerinde değişiklik yapabilir - cache'teki vektörlerin kopyası döner
+        return np.ascontiguousarray(np.stack(vectors), dtype=np.float32)
+
+    def flush(self):
+        """Cache'i diske yaz (atomik)"""
+        if not self.disk_path:
+            return
+        with self._lock:
+            keys = list(self._entries.keys())
+            matrix = np.stack(list(self._entries.values())) if keys else np.zeros((0, 0), dtype=np.float32)
+            self._dirty = 0
+
+        try:
+            tmp_matrix = self.disk_path + ".npy.tmp"
+            with open(tmp_matrix, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp_matrix, self.disk_path + ".npy")
+
+            tmp_keys = self.disk_path + ".json.tmp"
+            with open(tmp_keys, "w", encoding="utf-8") as f:
+                json.dump({"version": QUERY_CACHE_FORMAT_VERSION, "model_name": self.model_name, "keys": keys},
+                          f, ensure_ascii=False)
+            os.replace(tmp_keys, self.disk_path + ".json")
+        except OSError as e:
+            print(f"⚠️ Query cache flush failed: {e}")
+
+    def _load_from_disk(self):
+        try:
+            with open(self.disk_path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != QUERY_CACHE_FORMAT_VERSION or meta.get("model_name") != self.model_name:
+                return
+            matrix = np.load(self.disk_path + ".npy")
+            if len(matrix) != len(meta["keys"]):
+                return
+            for key, vector in zip(meta["keys"][-self.max_entries:], matrix[-self.max_entries:]):
+                self._entries[key] = vector.astype(np.float32)
+            print(f"💾 Loaded {len(self._entries)} cached query embeddings")
+        except (OSError, ValueError, KeyError, json.JSONDecodeError):
+            pass
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "disk_backed": bool(self.disk_path)
+        }
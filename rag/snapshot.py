@@ -0,0 +1,133 @@
+# rag/snapshot.py - Versiyonlu, atomik RAG cache snapshot'ları
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_KEEP = 2  # Mevcut + bir önceki (hala memmap'leyen worker'lar için)
+STALE_STAGING_SECONDS = 3600  # Yarıda kalmış (çökmüş process) staging dizinleri bu süreden sonra silinir
+MANIFEST_FILE = "manifest.json"
+
+# Snapshot içindeki bileşenler ve dosyaları
+COMPONENT_FILES = {
+    "items": ("items.pkl",),
+    "embeddings": ("embeddings.npy", "embeddings.json"),
+    "index": ("faiss.index", "faiss.index.json"),
+    "bm25": ("bm25.npz",),
+}
+
+
+def source_fingerprint(path: str) -> Dict:
+    """Kaynak veri dosyasının boyut + mtime parmak izi - içerik okunmadan O(1) değişiklik kontrolü"""
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class SnapshotStore:
+    """
+    Cache bileşenlerini (items, embeddings, FAISS index, BM25) tek bir versiyonlu dizinde tutar:
+
+        <cache_dir>/<name>/000007/manifest.json, items.pkl, embeddings.npy, ...
+        <cache_dir>/<name>/CURRENT  -> "000007"
+
+    Yeni snapshot geçici bir dizinde hazırlanır, manifest en son yazılır ve dizin rename ile
+    yayınlanır; ardından CURRENT işaretçisi os.replace ile değiştirilir. Okuyucular her zaman
+    tamamlanmış bir snapshot görür. Değişmeyen bileşen dosyaları önceki snapshot'tan hard link'lenir.
+    """
+
+    def __init__(self, cache_dir: str, name: str = "snapshots"):
+        self.root = os.path.join(cache_dir, name)
+        self.pointer_file = os.path.join(self.root, "CURRENT")
+
+    def current_dir(self) -> Optional[str]:
+        try:
+            with open(self.pointer_file, "r", encoding="utf-8") as f:
+                path = os.path.join(self.root, f.read().strip())
+        except OSError:
+            return None
+        return path if os.path.isdir(path) else None
+
+    def read_manifest(self) -> Optional[Dict]:
+        """Mevcut snapshot'ın manifest'i - yoksa, bozuksa ya da format eskiyse None"""
+        current = self.current_dir()
+        if current is None:
+            return None
+        try:
+            with open(os.path.join(current, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print("⚠️ Snapshot manifest unreadable")
+            return None
+        if manifest.get("version") != SNAPSHOT_FORMAT_VERSION:
+            print(f"⚠️ Snapshot format {manifest.get('version')} != {SNAPSHOT_FORMAT_VERSION}")
+            return None
+        return manifest
+
+    def begin(self) -> str:
+        """Yeni snapshot için geçici dizin - yayınlanana kadar okuyuculara görünmez"""
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+
+    def reuse(self, source_path: str, staging_dir: str, file_name: str):
+        """Değişmeyen bileşen dosyasını yeni snapshot'a hard link'le (olmazsa kopyala)"""
+        target = os.path.join(staging_dir, file_name)
+        if os.path.abspath(source_path) == os.path.abspath(target):
+            return
+        try:
+            os.link(source_path, target)
+        except OSError:
+            shutil.copy2(source_path, target)
+
+    def commit(self, staging_dir: str, manifest: Dict) -> str:
+        """Manifest'i yaz, dizini yayınla ve CURRENT'ı atomik olarak güncelle - snapshot dizinini döndürür"""
+        previous = self.read_manifest()
+        number = (previous or {}).get("snapshot", 0) + 1
+        manifest = dict(manifest, version=SNAPSHOT_FORMAT_VERSION, created_at=time.time())
+
+        while True:
+            name = f"{number:06d}"
+            manifest["snapshot"] = number
+            with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            try:
+                # Başka bir process aynı numarayı yayınladıysa rename başarısız olur - sonraki numara
+                os.rename(staging_dir, os.path.join(self.root, name))
+                break
+            except OSError:
+                if not os.path.isdir(os.path.join(self.root, name)):
+                    raise
+                number += 1
+
+        tmp_pointer = f"{self.pointer_file}.{os.getpid()}.tmp"
+        with open(tmp_pointer, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(tmp_pointer, self.pointer_file)
+
+        self._prune(keep=name)
+        return os.path.join(self.root, name)
+
+    def discard(self, staging_dir: str):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _prune(self, keep: str):
+        """
+        En yeni SNAPSHOT_KEEP snapshot dışındakileri ve eski staging dizinlerini sil
+        (silinen dosyaları memmap'lemiş process'ler POSIX'te okumaya devam edebilir)
+        """
+        names = os.listdir(self.root)
+        published = sorted(name for name in names if name.isdigit())
+        for name in published[:-SNAPSHOT_KEEP]:
+            if name != keep:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if name.startswith(".staging-") and now - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
@@ -1,46 +1,196 @@
 # services/currency_service.py
-import requests
-from typing import Dict, Any
+import asyncio
+import os
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from services.http_client import get_session, get_with_retry
+from services.ttl_cache import TTLCache
 
 class CurrencyService:
-    """Currency Exchange API Servisi"""
+    """Currency Exchange API Servisi - kur tabloları TTL cache'te tutulur"""
     
     def __init__(self):
         self.base_url = "https://api.exchangerate-api.com/v4/latest"
+        
+        # Kur tablosu her para birimi için tüm kurları içerir ve günde bir güncellenir.
+        # TTL dolunca bayat tablo dönülür ve arka planda yenilenir (stale-while-revalidate).
+        self.rates_cache = TTLCache(
+            ttl=float(os.getenv("CURRENCY_CACHE_TTL", "21600")),           # 6 saat
+            max_stale=float(os.getenv("CURRENCY_CACHE_MAX_STALE", "86400")), # +24 saat
+            max_entries=64
+        )
+        self.derived_hits = 0
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_tasks = set()
     
     def get_currency_data(self, amount: float, from_currency: str, to_currency: str) -> Dict[str, Any]:
         """Para birimi çevirme"""
         try:
-            url = f"{self.base_url}/{from_currency.upper()}"
-            
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            base = from_currency.upper()
+            data, refresh_base = self._lookup_cached_rates(base, to_currency.upper())
             
-            to_currency_upper = to_currency.upper()
+            if data is None:
+                data = self._fetch_rates(base)
+            elif refresh_base:
+                self._refresh_in_background(refresh_base)
             
-            if to_currency_upper in data.get("rates", {}):
-                exchange_rate = data["rates"][to_currency_upper]
-                converted_amount = round(amount * exchange_rate, 2)
+            return self._convert(data, amount, from_currency, to_currency)
                 
-                return {
-                    "success": True,
-                    "amount": amount,
-                    "from_currency": from_currency.upper(),
-                    "to_currency": to_currency_upper,
-                    "exchange_rate": exchange_rate,
-                    "converted_amount": converted_amount,
-                    "date": data.get("date")
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"'{to_currency}' para birimi desteklenmiyor"
-                }
+        except Exception as e:
+            return {"success": False, "error": f"Currency API hatası: {str(e)}"}
+    
+    async def get_currency_data_async(self, amount: float, from_currency: str, to_currency: str) -> Dict[str, Any]:
+        """Para birimi çevirme - event loop'u bloklamayan async versiyon"""
+        try:
+            base = from_currency.upper()
+            data, refresh_base = self._lookup_cached_rates(base, to_currency.upper())
+            
+            if data is None:
+                data = await self._fetch_rates_async(base)
+            elif refresh_base:
+                self._refresh_in_background_async(refresh_base)
+            
+            return self._convert(data, amount, from_currency, to_currency)
                 
         except Exception as e:
             return {"success": False, "error": f"Currency API hatası: {str(e)}"}
     
+    def _fetch_rates(self, base: str) -> Dict[str, Any]:
+        """Kur tablosunu API'den çek ve cache'le"""
+        response = get_session().get(f"{self.base_url}/{base}", timeout=10)
+        response.raise_for_status()
+        return self._store_rates(base, response.json())
+    
+    async def _fetch_rates_async(self, base: str) -> Dict[str, Any]:
+        """Kur tablosunu API'den async çek ve cache'le"""
+        response = await get_with_retry(f"{self.base_url}/{base}", timeout=10)
+        response.raise_for_status()
+        return self._store_rates(base, response.json())
+    
+    def _store_rates(self, base: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        table = {
+            "base": base,
+            "date": data.get("date"),
+            "rates": data.get("rates", {})
+        }
+        if table["rates"]:
+            self.rates_cache.set(base, table)
+        return table
+    
+    def _lookup_cached_rates(self, base: str, target: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Cache'ten kur tablosu bul. (data, yenilenecek_base) döner.
+        Öncelik: taze direkt tablo > taze tablodan çapraz kur > bayat direkt tablo > bayat tablodan çapraz kur
+        """
+        direct, fresh = self.rates_cache.get_entry(base)
+        if direct is not None and fresh:
+            return direct, None
+        
+        derived = self._derive_cross_rates(base, target, fresh_only=True)
+        if derived:
+            return derived, None
+        
+        if direct is not None:
+            return direct, base
+        
+        derived = self._derive_cross_rates(base, target, fresh_only=False)
+        if derived:
+            return derived, derived["derived_from"]
+        
+        return None, None
+    
+    def _derive_cross_rates(self, base: str, target: str, fresh_only: bool) -> Optional[Dict[str, Any]]:
+        """Başka bir base'in tablosundan çapraz kur hesapla (örn. USD tablosundan EUR→TRY)"""
+        for cached_base, table, fresh in self.rates_cache.items():
+            if fresh_only and not fresh:
+                continue
+            rates = table["rates"]
+            if base in rates and target in rates and rates[base]:
+                self.derived_hits += 1
+                return {
+                    "base": base,
+                    "date": table.get("date"),
+                    # Tam hassasiyet - küçük çapraz kurlar (örn. IDR→USD) yuvarlanınca çeviri bozulur
+                    "rates": {target: rates[target] / rates[base]},
+                    "derived_from": cached_base
+                }
+        return None
+    
+    def _claim_refresh(self, base: str) -> bool:
+        """Aynı base için tek bir arka plan yenilemesi çalışsın"""
+        with self._refresh_lock:
+            if base in self._refreshing:
+                return False
+            self._refreshing.add(base)
+            return True
+    
+    def _release_refresh(self, base: str):
+        with self._refresh_lock:
+            self._refreshing.discard(base)
+    
+    def _refresh_in_background(self, base: str):
+        if not self._claim_refresh(base):
+            return
+        
+        def _refresh():
+            try:
+                self._fetch_rates(base)
+            except Exception as e:
+                print(f"⚠️ Kur yenileme hatası ({base}): {e}")
+            finally:
+                self._release_refresh(base)
+        
+        threading.Thread(target=_refresh, daemon=True).start()
+    
+    def _refresh_in_background_async(self, base: str):
+        if not self._claim_refresh(base):
+            return
+        
+        async def _refresh():
+            try:
+                await self._fetch_rates_async(base)
+            except Exception as e:
+                print(f"⚠️ Kur yenileme hatası ({base}): {e}")
+            finally:
+                self._release_refresh(base)
+        
+        task = asyncio.get_running_loop().create_task(_refresh())
+        # Task referansını tut, GC tarafından toplanmasın
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Kur cache istatistikleri"""
+        stats = self.rates_cache.get_stats()
+        stats["derived_hits"] = self.derived_hits
+        return stats
+    
+    def _convert(self, data: Dict[str, Any], amount: float, from_currency: str, to_currency: str) -> Dict[str, Any]:
+        """Kur tablosundan çevirme sonucunu hesapla"""
+        to_currency_upper = to_currency.upper()
+        
+        if to_currency_upper in data.get("rates", {}):
+            exchange_rate = data["rates"][to_currency_upper]
+            converted_amount = round(amount * exchange_rate, 2)
+            
+            return {
+                "success": True,
+                "amount": amount,
+                "from_currency": from_currency.upper(),
+                "to_currency": to_currency_upper,
+                "exchange_rate": exchange_rate,
+                "converted_amount": converted_amount,
+                "date": data.get("date"),
+                "derived_from": data.get("derived_from")
+            }
+        else:
+            return {
+                "success": False,
+                "error": f"'{to_currency}' para birimi desteklenmiyor"
+            }
+    
     def format_response(self, data: Dict[str, Any]) -> str:
         """Response formatla"""
         if not data.get("success"):
@@ -49,6 +199,6 @@ class CurrencyService:
         return (
             f"💱 **Para Birimi Çevirme**\n"
             f"💰 {data['amount']} {data['from_currency']} = **{data['converted_amount']} {data['to_currency']}**\n"
-            f"📊 Kur: 1 {data['from_currency']} = {data['exchange_rate']} {data['to_currency']}\n"
+            f"📊 Kur: 1 {data['from_currency']} = {data['exchange_rate']:.6g} {data['to_currency']}\n"
             f"📅 Tarih: {data.get('date', 'Bilinmiyor')}"
         )
\ No newline at end of file
@@ -1,9 +1,10 @@
 # services/directions_service.py - Gaziantep Sınırlı Yol Tarifi Servisi
-import requests
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import quote
 
+from services.http_client import get_session, get_with_retry
+
 class DirectionsService:
     """Google Directions API Servisi - Sadece Gaziantep İçi Aramalar"""
     
@@ -106,30 +107,60 @@ class DirectionsService:
     
     def get_directions_data(self, origin: str, destination: str, travel_mode: str = "driving", language: str = "tr") -> Dict[str, Any]:
         """Gaziantep içi yol tarifi al"""
+        params, error = self._build_params(origin, destination, travel_mode, language)
+        if error:
+            return error
+        
+        try:
+            response = get_session().get(self.base_url, params=params, timeout=15)
+            response.raise_for_status()
+            data = response.json()
+            
+            return self._handle_api_data(data, params, travel_mode, language, origin, destination)
+                
+        except Exception as e:
+            error_msg = f"{self.ui_texts[language]['directions_api_error']}: {str(e)}"
+            return {"success": False, "error": error_msg}
+    
+    async def get_directions_data_async(self, origin: str, destination: str, travel_mode: str = "driving", language: str = "tr") -> Dict[str, Any]:
+        """get_directions_data'nın event loop'u bloklamayan async versiyonu"""
+        params, error = self._build_params(origin, destination, travel_mode, language)
+        if error:
+            return error
+        
+        try:
+            response = await get_with_retry(self.base_url, params=params, timeout=15)
+            response.raise_for_status()
+            data = response.json()
+            
+            return self._handle_api_data(data, params, travel_mode, language, origin, destination)
+                
+        except Exception as e:
+            error_msg = f"{self.ui_texts[language]['directions_api_error']}: {str(e)}"
+            return {"success": False, "error": error_msg}
+    
+    def _build_params(self, origin: str, destination: str, travel_mode: str, language: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Lokasyonları doğrula ve API parametrelerini hazırla - (params, error) döner"""
         api_key = os.getenv("GOOGLE_MAPS_API_KEY")
         if not api_key:
-            return {
+            return None, {
                 "success": False, 
                 "error": self.ui_texts[language]["error_api_key"]
             }
         
-        # Orijinal query'leri sakla
-        original_origin = origin
-        original_destination = destination
-        
         # Gaziantep lokasyonlarını çözümle
         resolved_origin = self._resolve_gaziantep_location(origin)
         resolved_destination = self._resolve_gaziantep_location(destination)
         
         # Gaziantep sınırları kontrolü
         if not self._is_location_in_gaziantep(resolved_origin):
-            return {
+            return None, {
                 "success": False,
                 "error": f"{self.ui_texts[language]['location_not_in_gaziantep']}: {origin}"
             }
         
         if not self._is_location_in_gaziantep(resolved_destination):
-            return {
+            return None, {
                 "success": False,
                 "error": f"{self.ui_texts[language]['location_not_in_gaziantep']}: {destination}"
             }
@@ -145,26 +176,21 @@ class DirectionsService:
             "key": api_key,
             "language": google_lang,
             "units": "metric",
-            "alternatives": True,
+            "alternatives": "true",
             "region": "TR"  # Türkiye bölgesi
         }
-        
-        try:
-            response = requests.get(self.base_url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("status") == "OK":
-                return self._process_directions_data(
-                    data, resolved_origin, resolved_destination, travel_mode, language, 
-                    original_origin, original_destination
-                )
-            else:
-                error_msg = f"{self.ui_texts[language]['directions_api_error']}: {data.get('status')} - {data.get('error_message', self.ui_texts[language]['unknown_error'])}"
-                return {"success": False, "error": error_msg}
-                
-        except Exception as e:
-            error_msg = f"{self.ui_texts[language]['directions_api_error']}: {str(e)}"
+        return params, None
+    
+    def _handle_api_data(self, data: Dict[str, Any], params: Dict[str, Any], travel_mode: str, language: str,
+                         original_origin: str, original_destination: str) -> Dict[str, Any]:
+        """API yanıtını status'a göre işle"""
+        if data.get("status") == "OK":
+            return self._process_directions_data(
+                data, params["origin"], params["destination"], travel_mode, language, 
+                original_origin, original_destination
+            )
+        else:
+            error_msg = f"{self.ui_texts[language]['directions_api_error']}: {data.get('status')} - {data.get('error_message', self.ui_texts[language]['unknown_error'])}"
             return {"success": False, "error": error_msg}
     
     def _generate_map_links(self, origin: str, destination: str, travel_mode: str, language: str) -> Dict[str, str]:
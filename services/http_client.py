@@ -0,0 +1,164 @@
+# services/http_client.py - Servisler için paylaşımlı HTTP client'lar (connection pool)
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Havuz ayarları - environment'tan değiştirilebilir
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))        # Ayrı pool tutulan host sayısı
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "20"))    # Host başına açık bağlantı
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.3"))           # 0.3s, 0.6s, 1.2s ...
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+
+# Geçici hatalarda tekrar denenecek status kodları
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Tek sync session ve tek async client - tüm servisler aynı pool'u kullanır
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_async_client: Optional[httpx.AsyncClient] = None
+# httpx.Limits host başına sınır koymaz - async istekler host başına semaphore ile sınırlanır
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+_host_in_flight: Dict[str, int] = {}
+
+
+def _build_retry() -> Retry:
+    """Backoff'lu retry politikası - POST sadece bağlantı hatalarında tekrar edilir"""
+    return Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,
+        status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+        raise_on_status=False
+    )
+
+
+def get_session() -> requests.Session:
+    """Paylaşımlı keep-alive requests session döndür (lazy oluşturulur)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_HOSTS,
+                    pool_maxsize=HTTP_MAX_PER_HOST,
+                    max_retries=_build_retry()
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Paylaşımlı async HTTP client döndür (lazy oluşturulur)"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        # Retry'lar get_with_retry'da (backoff + status kodları) - transport ayrıca tekrar denemez
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE
+            )
+        )
+        _async_client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(HTTP_TIMEOUT)
+        )
+    return _async_client
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """Exponential backoff (0.3s, 0.6s, 1.2s ...) - 429/503'teki sayısal Retry-After daha uzunsa o beklenir"""
+    delay = HTTP_BACKOFF * (2 ** attempt)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("Retry-After", 0)))
+        except ValueError:
+            pass
+    return delay
+
+
+async def get_with_retry(url: str, timeout: float = HTTP_TIMEOUT, **kwargs) -> httpx.Response:
+    """
+    Paylaşımlı async client ile idempotent GET - bağlantı/timeout hatalarında ve 429/5xx'te
+    backoff'la HTTP_RETRIES kez tekrar dener. timeout tüm denemelerin toplam bütçesidir;
+    sığmayacak bir deneme yapılmaz. Aynı host'a en fazla HTTP_MAX_PER_HOST istek aynı anda gider.
+    Son denemenin yanıtı döner (status kontrolü çağırana kalır), hata varsa son hata fırlatılır.
+    """
+    host = httpx.URL(url).host
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = _host_semaphores.setdefault(host, asyncio.Semaphore(HTTP_MAX_PER_HOST))
+    deadline = time.monotonic() + timeout
+
+    attempt = 0
+    while True:
+        response = error = None
+        async with semaphore:
+            _host_in_flight[host] = _host_in_flight.get(host, 0) + 1
+            try:
+                response = await get_async_client().get(
+                    url, timeout=max(0.1, deadline - time.monotonic()), **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            finally:
+                _host_in_flight[host] -= 1
+
+        if error is None and response.status_code not in RETRY_STATUS_CODES:
+            return response
+
+        delay = _retry_delay(response, attempt)
+        if attempt >= HTTP_RETRIES or time.monotonic() + delay >= deadline:
+            if error is not None:
+                raise error
+            return response
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def close_session():
+    """Sync session'ı kapat"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+async def close_async_client():
+    """Uygulama kapanırken async client'ı kapat"""
+    global _async_client
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+    _host_semaphores.clear()
+    _host_in_flight.clear()
+
+
+def get_pool_config() -> dict:
+    """Aktif pool ayarları - health/stats için"""
+    return {
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive": HTTP_MAX_KEEPALIVE,
+        "pool_hosts": HTTP_POOL_HOSTS,
+        "max_per_host": HTTP_MAX_PER_HOST,
+        "retries": HTTP_RETRIES,
+        "backoff_factor": HTTP_BACKOFF,
+        "timeout": HTTP_TIMEOUT,
+        # Async (webhook endpoint'leri): host başına max_per_host eşzamanlı istek, get_with_retry ile retry
+        "async_in_flight": {host: count for host, count in _host_in_flight.items() if count}
+    }
@@ -1,7 +1,8 @@
 # services/places_service.py - Multi-language Enhanced Version
-import requests
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+
+from services.http_client import get_session, get_with_retry
 
 class PlacesService:
     """Google Places API Servisi - Çok Dilli Destek"""
@@ -176,16 +177,53 @@ class PlacesService:
     
     def get_places_data(self, query: str, location: str = None, language: str = "tr") -> Dict[str, Any]:
         """Akıllı yer arama - çok dilli destek"""
-        api_key = os.getenv("GOOGLE_PLACES_API_KEY")
-        if not api_key:
+        params, final_query = self._build_params(query, location, language)
+        if params is None:
+            return {
+                "success": False, 
+                "error": self.ui_texts[language]["error_api_key"]
+            }
+        
+        try:
+            response = get_session().get(self.base_url, params=params, timeout=15)
+            response.raise_for_status()
+            data = response.json()
+            
+            return self._handle_api_data(data, final_query, language)
+                
+        except Exception as e:
+            error_msg = f"{self.ui_texts[language]['places_api_error']}: {str(e)}"
+            return {"success": False, "error": error_msg}
+    
+    async def get_places_data_async(self, query: str, location: str = None, language: str = "tr") -> Dict[str, Any]:
+        """get_places_data'nın event loop'u bloklamayan async versiyonu"""
+        params, final_query = self._build_params(query, location, language)
+        if params is None:
             return {
                 "success": False, 
                 "error": self.ui_texts[language]["error_api_key"]
             }
         
+        try:
+            response = await get_with_retry(self.base_url, params=params, timeout=15)
+            response.raise_for_status()
+            data = response.json()
+            
+            return self._handle_api_data(data, final_query, language)
+                
+        except Exception as e:
+            error_msg = f"{self.ui_texts[language]['places_api_error']}: {str(e)}"
+            return {"success": False, "error": error_msg}
+    
+    def _build_params(self, query: str, location: str, language: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Places API parametrelerini hazırla - API anahtarı yoksa params None"""
         # SMART QUERY BUILDING with language support
         final_query = self._build_smart_query(query, location, language)
         
+        api_key = os.getenv("GOOGLE_PLACES_API_KEY")
+        if not api_key:
+            return None, final_query
+        
         # Google Places API language
         google_lang = self.google_lang_map.get(language, "en")
         
@@ -195,20 +233,14 @@ class PlacesService:
             "language": google_lang,
             "region": self._get_region_for_language(language)
         }
-        
-        try:
-            response = requests.get(self.base_url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("status") == "OK":
-                return self._process_places_data(data, final_query, language)
-            else:
-                error_msg = f"{self.ui_texts[language]['places_api_error']}: {data.get('status')} - {data.get('error_message', self.ui_texts[language]['unknown_error'])}"
-                return {"success": False, "error": error_msg}
-                
-        except Exception as e:
-            error_msg = f"{self.ui_texts[language]['places_api_error']}: {str(e)}"
+        return params, final_query
+    
+    def _handle_api_data(self, data: Dict[str, Any], final_query: str, language: str) -> Dict[str, Any]:
+        """API yanıtını status'a göre işle"""
+        if data.get("status") == "OK":
+            return self._process_places_data(data, final_query, language)
+        else:
+            error_msg = f"{self.ui_texts[language]['places_api_error']}: {data.get('status')} - {data.get('error_message', self.ui_texts[language]['unknown_error'])}"
             return {"success": False, "error": error_msg}
     
     def _get_region_for_language(self, language: str) -> str:
@@ -0,0 +1,48 @@
+# services/single_flight.py - Aynı anda gelen özdeş istekleri tek upstream çağrısında birleştir
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def normalize_key(*parts: Any) -> tuple:
+    """Payload parçalarından normalize edilmiş anahtar üret (boşluk/büyük-küçük harf farkı yok)"""
+    normalized = []
+    for part in parts:
+        if isinstance(part, str):
+            normalized.append(" ".join(part.split()).casefold())
+        else:
+            normalized.append(part)
+    return tuple(normalized)
+
+
+class SingleFlight:
+    """
+    Async single-flight: aynı anahtarla gelen eşzamanlı çağrılar tek bir
+    in-flight task'ı bekler ve aynı sonucu paylaşır.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """func'ı anahtar başına en fazla bir kez çalıştır, bekleyen herkese sonucu döndür"""
+        self.calls += 1
+        task = self._inflight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _, k=key: self._inflight.pop(k, None))
+        else:
+            self.shared += 1
+
+        # shield: bir client bağlantıyı koparırsa diğerlerinin beklediği task iptal olmasın
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._inflight)
+        }
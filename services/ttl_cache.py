@@ -0,0 +1,80 @@
+# services/ttl_cache.py - Servis yanıtları için basit in-process TTL cache
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Thread-safe TTL cache.
+    ttl süresince kayıt "taze", ttl + max_stale süresince "bayat" sayılır;
+    bayat kayıtlar stale-while-revalidate için döndürülebilir.
+    """
+
+    def __init__(self, ttl: float, max_stale: float = 0.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Tuple[Any, float, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get_entry(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        """(value, is_fresh) döndür - kayıt yok veya tamamen eskimişse (None, False)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            value, stored_at, ttl = entry
+            age = time.monotonic() - stored_at
+            if age <= ttl:
+                self.hits += 1
+                return value, True
+            if age <= ttl + self.max_stale:
+                self.stale_hits += 1
+                return value, False
+
+            del self._data[key]
+            self.misses += 1
+            return None, False
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Sadece taze kaydı döndür"""
+        value, fresh = self.get_entry(key)
+        return value if fresh else None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Kaydı ekle - ttl verilirse bu kayıt için varsayılan TTL'i ezer"""
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.max_entries:
+                # En eski kaydı at
+                oldest = min(self._data, key=lambda k: self._data[k][1])
+                del self._data[oldest]
+            self._data[key] = (value, time.monotonic(), self.ttl if ttl is None else ttl)
+
+    def items(self):
+        """Tamamen eskimemiş (key, value, is_fresh) kayıtları döndür"""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = list(self._data.items())
+        for key, (value, stored_at, ttl) in snapshot:
+            age = now - stored_at
+            if age <= ttl + self.max_stale:
+                yield key, value, age <= ttl
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "ttl": self.ttl
+        }
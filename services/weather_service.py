@@ -1,8 +1,18 @@
 # services/weather_service.py
 import requests
+import httpx
 import json
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
+
+from services.http_client import get_session, get_with_retry
+from services.ttl_cache import TTLCache
+
+# OpenWeather forecast verisi 3 saatlik slotlar halinde güncellenir
+FORECAST_UPDATE_INTERVAL = 3 * 3600
+FORECAST_UPDATE_GRACE = 300   # Yeni slot yayınlanana kadar küçük pay
+FORECAST_MIN_TTL = 600
 
 class WeatherService:
     """OpenWeather API Servisi - Çok Dilli Destek"""
@@ -10,6 +20,12 @@ class WeatherService:
     def __init__(self):
         self.base_url = "http://api.openweathermap.org/data/2.5/forecast"
         
+        # (şehir, dil) başına tek forecast payload'ı - bugün/yarın/5 gün hepsi buradan seçilir
+        self.forecast_cache = TTLCache(
+            ttl=float(os.getenv("WEATHER_CACHE_TTL", str(FORECAST_UPDATE_INTERVAL))),
+            max_entries=512
+        )
+        
         # Çok dilli hava durumu açıklamaları
         self.weather_descriptions = {
             "clear sky": {
@@ -409,56 +425,24 @@ class WeatherService:
         Belirtilen şehir için OpenWeatherMap Forecast API'sinden hava durumu verilerini çeker.
         language: "tr", "en", "de", "fr", "es", "it", "ja", "ar", "ru", "zh"
         """
-        # API anahtarını environment'tan al
-        api_key = os.getenv("OPENWEATHER_API_KEY")
-        if not api_key:
+        URL = self._build_url(city_name, language)
+        if not URL:
             return {
                 "success": False,
                 "error": self.ui_texts[language]["error_api_key"]
             }
         
-        # OpenWeatherMap API dil kodları (bazıları farklı)
-        api_lang_map = {
-            "tr": "tr", "en": "en", "de": "de", "fr": "fr", 
-            "es": "es", "it": "it", "ja": "ja", "ar": "ar", 
-            "ru": "ru", "zh": "zh_cn"
-        }
-        api_lang = api_lang_map.get(language, "en")
-        
-        URL = f"{self.base_url}?q={city_name}&appid={api_key}&units=metric&lang={api_lang}&cnt=40"
+        cache_key = self._forecast_cache_key(city_name, language)
         
         try:
-            response = requests.get(URL)
-            response.raise_for_status()
-            data = response.json()
+            data = self.forecast_cache.get(cache_key)
+            if data is None:
+                response = get_session().get(URL, timeout=15)
+                response.raise_for_status()
+                data = response.json()
+                self._cache_forecast(cache_key, data)
             
-            if data.get("cod") == "200":
-                forecasts = data["list"]
-                city_info = data["city"]
-                
-                # Zaman periyoduna göre veri seçimi
-                if time_period.lower() in ["bugün", "şu an", "şimdi", "güncel", "today", "current", "heute", "aktuell", "aujourd'hui", "actuel", "hoy", "actual", "oggi", "attuale", "今日", "현재", "اليوم", "حالي", "сегодня", "текущий", "今天", "当前"]:
-                    forecast = forecasts[0]
-                    return self._format_single_day_weather(forecast, city_info, "current", language)
-                    
-                elif time_period.lower() in ["yarın", "ertesi gün", "tomorrow", "morgen", "demain", "mañana", "domani", "明日", "내일", "غداً", "завтра", "明天"]:
-                    target_index = min(8, len(forecasts) - 1)
-                    forecast = forecasts[target_index]
-                    return self._format_single_day_weather(forecast, city_info, "tomorrow", language)
-                    
-                elif time_period.lower() in ["gelecek", "5gün", "hafta", "haftasonu", "5days", "week", "5tage", "woche", "5jours", "semaine", "5días", "semana", "5giorni", "settimana", "5日間", "週間", "5أيام", "أسبوع", "5дней", "неделя", "5天", "周"]:
-                    return self._format_5day_weather(forecasts, city_info, language)
-                    
-                else:
-                    # Default olarak bugün
-                    forecast = forecasts[0]
-                    return self._format_single_day_weather(forecast, city_info, "current", language)
-                
-            else:
-                return {
-                    "success": False,
-                    "error": f"{self.ui_texts[language]['error_city_not_found']}: {data.get('message', '')}"
-                }
+            return self._select_forecast(data, time_period, language)
                 
         except requests.exceptions.RequestException as e:
             return {
@@ -476,6 +460,109 @@ class WeatherService:
                 "error": f"{self.ui_texts[language]['error_unexpected']}: {e}"
             }
 
+    async def get_weather_data_async(self, city_name: str, time_period: str = "bugün", language: str = "tr") -> Dict[str, Any]:
+        """get_weather_data'nın event loop'u bloklamayan async versiyonu"""
+        URL = self._build_url(city_name, language)
+        if not URL:
+            return {
+                "success": False,
+                "error": self.ui_texts[language]["error_api_key"]
+            }
+        
+        cache_key = self._forecast_cache_key(city_name, language)
+        
+        try:
+            data = self.forecast_cache.get(cache_key)
+            if data is None:
+                response = await get_with_retry(URL)
+                response.raise_for_status()
+                data = response.json()
+                self._cache_forecast(cache_key, data)
+            
+            return self._select_forecast(data, time_period, language)
+                
+        except httpx.HTTPError as e:
+            return {
+                "success": False,
+                "error": f"{self.ui_texts[language]['error_network']}: {e}"
+            }
+        except json.JSONDecodeError:
+            return {
+                "success": False,
+                "error": self.ui_texts[language]["error_invalid_response"]
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"{self.ui_texts[language]['error_unexpected']}: {e}"
+            }
+
+    def _build_url(self, city_name: str, language: str) -> Optional[str]:
+        """Forecast API URL'ini oluştur - API anahtarı yoksa None"""
+        # API anahtarını environment'tan al
+        api_key = os.getenv("OPENWEATHER_API_KEY")
+        if not api_key:
+            return None
+        
+        # OpenWeatherMap API dil kodları (bazıları farklı)
+        api_lang_map = {
+            "tr": "tr", "en": "en", "de": "de", "fr": "fr", 
+            "es": "es", "it": "it", "ja": "ja", "ar": "ar", 
+            "ru": "ru", "zh": "zh_cn"
+        }
+        api_lang = api_lang_map.get(language, "en")
+        
+        return f"{self.base_url}?q={city_name}&appid={api_key}&units=metric&lang={api_lang}&cnt=40"
+
+    def _forecast_cache_key(self, city_name: str, language: str) -> tuple:
+        return (city_name.strip().casefold(), language)
+
+    def _forecast_ttl(self) -> float:
+        """Bir sonraki 3 saatlik OpenWeather güncellemesine kalan süre"""
+        now = time.time()
+        next_update = (now // FORECAST_UPDATE_INTERVAL + 1) * FORECAST_UPDATE_INTERVAL
+        ttl = next_update - now + FORECAST_UPDATE_GRACE
+        return min(max(ttl, FORECAST_MIN_TTL), self.forecast_cache.ttl)
+
+    def _cache_forecast(self, cache_key: tuple, data: Dict[str, Any]):
+        """Sadece başarılı forecast payload'larını cache'le"""
+        if data.get("cod") == "200" and data.get("list"):
+            self.forecast_cache.set(cache_key, data, ttl=self._forecast_ttl())
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Forecast cache istatistikleri"""
+        return self.forecast_cache.get_stats()
+
+    def _select_forecast(self, data: Dict[str, Any], time_period: str, language: str) -> Dict[str, Any]:
+        """Forecast payload'ından istenen zaman periyodunu seç"""
+        if data.get("cod") == "200":
+            forecasts = data["list"]
+            city_info = data["city"]
+            
+            # Zaman periyoduna göre veri seçimi
+            if time_period.lower() in ["bugün", "şu an", "şimdi", "güncel", "today", "current", "heute", "aktuell", "aujourd'hui", "actuel", "hoy", "actual", "oggi", "attuale", "今日", "현재", "اليوم", "حالي", "сегодня", "текущий", "今天", "当前"]:
+                forecast = forecasts[0]
+                return self._format_single_day_weather(forecast, city_info, "current", language)
+                
+            elif time_period.lower() in ["yarın", "ertesi gün", "tomorrow", "morgen", "demain", "mañana", "domani", "明日", "내일", "غداً", "завтра", "明天"]:
+                target_index = min(8, len(forecasts) - 1)
+                forecast = forecasts[target_index]
+                return self._format_single_day_weather(forecast, city_info, "tomorrow", language)
+                
+            elif time_period.lower() in ["gelecek", "5gün", "hafta", "haftasonu", "5days", "week", "5tage", "woche", "5jours", "semaine", "5días", "semana", "5giorni", "settimana", "5日間", "週間", "5أيام", "أسبوع", "5дней", "неделя", "5天", "周"]:
+                return self._format_5day_weather(forecasts, city_info, language)
+                
+            else:
+                # Default olarak bugün
+                forecast = forecasts[0]
+                return self._format_single_day_weather(forecast, city_info, "current", language)
+            
+        else:
+            return {
+                "success": False,
+                "error": f"{self.ui_texts[language]['error_city_not_found']}: {data.get('message', '')}"
+            }
+
     def _format_single_day_weather(self, forecast: Dict, city_info: Dict, period_key: str, language: str) -> Dict[str, Any]:
         """Tek gün hava durumu formatla"""
         main_data = forecast["main"]
@@ -14,6 +14,9 @@ from services.places_service import PlacesService
 from services.currency_service import CurrencyService
 # YENİ: Directions service eklendi
 from services.directions_service import DirectionsService
+from services.http_client import close_async_client, close_session, get_pool_config
+from services.single_flight import SingleFlight, normalize_key
+from managers.resource_registry import get_resource_registry
 
 # FastAPI uygulaması oluştur
 app = FastAPI(title="RAG Chatbot Webhook API", version="4.0.0")
@@ -55,6 +58,37 @@ currency_service = CurrencyService()
 # YENİ: Directions service başlat
 directions_service = DirectionsService()
 
+# Eşzamanlı özdeş tool çağrıları tek upstream isteğini paylaşır
+single_flight = SingleFlight()
+
+# RAG_WARMUP_CORPORA="gaziantep,unesco" - startup'ta RAG motorları arka planda kurulmaya başlar
+RAG_WARMUP_CORPORA = [name.strip() for name in os.getenv("RAG_WARMUP_CORPORA", "").split(",") if name.strip()]
+
+@app.on_event("startup")
+async def warm_up_rag():
+    """İstenen RAG corpus'larını arka planda kur - ilerleme /health'te görünür"""
+    if not RAG_WARMUP_CORPORA:
+        return
+    
+    # Ağır bağımlılıklar sadece warm-up istendiğinde yüklenir
+    from gaziantep_rag import GaziantepRAGSystem
+    from simple_rag import SimpleRAGSystem
+    factories = {"gaziantep": GaziantepRAGSystem, "unesco": SimpleRAGSystem}
+    
+    registry = get_resource_registry()
+    for name in RAG_WARMUP_CORPORA:
+        factory = factories.get(name)
+        if factory is None:
+            print(f"⚠️ Unknown RAG corpus for warm-up: {name}")
+            continue
+        registry.get_rag_engine(name, factory, background=True)
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    """Paylaşımlı HTTP connection pool'larını kapat"""
+    await close_async_client()
+    close_session()
+
 # Çok dilli hata mesajları - Directions eklendi
 DIRECTIONS_ERROR_MESSAGES = {
     "tr": {
@@ -260,7 +294,14 @@ async def health_check():
         "weather_supported_languages": WEATHER_SUPPORTED_LANGUAGES,
         "api_keys_status": {
             "google_maps": "✅" if os.getenv("GOOGLE_MAPS_API_KEY") else "❌ Required for directions"
-        }
+        },
+        "http_pool": get_pool_config(),
+        "caches": {
+            "currency_rates": currency_service.get_cache_stats(),
+            "weather_forecasts": weather_service.get_cache_stats()
+        },
+        "single_flight": single_flight.get_stats(),
+        "rag": get_resource_registry().get_rag_readiness()
     }
 
 @app.post("/api/weather", response_model=APIResponse)
@@ -279,10 +320,13 @@ async def get_weather(request: WeatherRequest):
             )
             
         # Weather service'i language parametresi ile çağır
-        result = weather_service.get_weather_data(
-            request.city_name, 
-            request.time_period, 
-            language
+        result = await single_flight.do(
+            normalize_key("weather", request.city_name, request.time_period, language),
+            lambda: weather_service.get_weather_data_async(
+                request.city_name, 
+                request.time_period, 
+                language
+            )
         )
         
         if result.get("success"):
@@ -325,10 +369,13 @@ async def get_places(request: PlacesRequest):
             )
             
         # Places service'i language parametresi ile çağır
-        result = places_service.get_places_data(
-            request.query, 
-            request.location, 
-            language
+        result = await single_flight.do(
+            normalize_key("places", request.query, request.location, language),
+            lambda: places_service.get_places_data_async(
+                request.query, 
+                request.location, 
+                language
+            )
         )
         
         if result.get("success"):
@@ -362,10 +409,13 @@ async def get_currency(request: CurrencyRequest):
         if not request.amount or not request.from_currency or not request.to_currency:
             return APIResponse(success=False, error="Para birimleri ve miktar gerekli")
             
-        result = currency_service.get_currency_data(
-            request.amount, 
-            request.from_currency, 
-            request.to_currency
+        result = await single_flight.do(
+            normalize_key("currency", request.amount, request.from_currency, request.to_currency),
+            lambda: currency_service.get_currency_data_async(
+                request.amount, 
+                request.from_currency, 
+                request.to_currency
+            )
         )
         
         if result.get("success"):
@@ -399,11 +449,14 @@ async def get_directions(request: DirectionsRequest):
             return APIResponse(success=False, error=error_msg, language=language)
             
         # Directions service çağrısı
-        result = directions_service.get_directions_data(
-            request.origin, 
-            request.destination, 
-            request.travel_mode.lower(), 
-            language
+        result = await single_flight.do(
+            normalize_key("directions", request.origin, request.destination, request.travel_mode, language),
+            lambda: directions_service.get_directions_data_async(
+                request.origin, 
+                request.destination, 
+                request.travel_mode.lower(), 
+                language
+            )
         )
         
         if result.get("success"):